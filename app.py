@@ -1,22 +1,54 @@
+import gzip
+import json
 import os
 import re
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+import zlib
 from datetime import datetime
-from flask import Flask, request, render_template, send_file, jsonify, redirect, url_for, flash
+from functools import wraps
+import click
+from flask import Flask, Request, request, render_template, send_file, jsonify, redirect, url_for, flash, g, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_migrate import Migrate
 import pandas as pd
 import pdfplumber
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from config import Config
-from models import db, User
+from models import db, User, ApiToken
 from forms import LoginForm, RegistrationForm
+from fingerprint import load_index, first_page_words, learn_and_save
+from textstore import open_store
 from pdf_extractor import PDFFieldExtractor
+from sandbox import ExtractionSandbox
+from archive import ZipMembers, ArchiveLimitExceeded, is_zip, spool
+import safe_regex
+from safe_regex import compile_pattern
+
+class UploadRequest(Request):
+    """Request that allows archive-sized bodies on the upload endpoints."""
+    
+    ARCHIVE_ENDPOINTS = ('upload_file', 'api_extract')
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint in self.ARCHIVE_ENDPOINTS:
+            return app.config['MAX_ARCHIVE_LENGTH']
+        return super().max_content_length
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config.from_object(Config)
 
+# Bound the time and input each field pattern may use
+safe_regex.configure(timeout=app.config['REGEX_TIMEOUT'], window=app.config['REGEX_MAX_WINDOW'])
+
 # Initialize extensions
 db.init_app(app)
 migrate = Migrate(app, db)
@@ -36,19 +68,81 @@ ALLOWED_EXTENSIONS = {'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_variables(pdf_path, patterns):
+def match_variables(page_texts, patterns):
     results = {key: [] for key in patterns.keys()}
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            for var_name, pattern in patterns.items():
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    results[var_name].append(match.group())
+    for text in page_texts:
+        for var_name, pattern in patterns.items():
+            matches = compile_pattern(pattern, 0, var_name).finditer(text)
+            for match in matches:
+                results[var_name].append(match.group())
     
     return results
 
+def extract_variables(pdf_path, patterns):
+    with pdfplumber.open(pdf_path) as pdf:
+        return match_variables([page.extract_text() for page in pdf.pages], patterns)
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+def get_sandbox():
+    """Return the per-process extraction sandbox, creating it on first use."""
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = ExtractionSandbox(
+                timeout=app.config['EXTRACTION_TIMEOUT'],
+                memory_limit=app.config['EXTRACTION_MEMORY_LIMIT'],
+                max_pages=app.config['EXTRACTION_MAX_PAGES'],
+                max_tasks_per_worker=app.config['EXTRACTION_MAX_TASKS_PER_WORKER'],
+                template_index_path=app.config['TEMPLATE_INDEX_PATH'],
+                text_store_path=app.config['TEXT_STORE_PATH'],
+                regex_limits=(app.config['REGEX_TIMEOUT'], app.config['REGEX_MAX_WINDOW'])
+            )
+    return _sandbox
+
+def extract_document(pdf_path):
+    """Extract the fields of one PDF, in a sandboxed subprocess when isolation is enabled."""
+    if app.config['EXTRACTION_ISOLATED']:
+        return get_sandbox().extract(pdf_path)
+    template_index = load_index(app.config['TEMPLATE_INDEX_PATH'])
+    text_store = open_store(app.config['TEXT_STORE_PATH'])
+    with PDFFieldExtractor(pdf_path, template_index=template_index, text_store=text_store) as extractor:
+        return extractor.extract_fields()
+
+def extract_upload(save, filename):
+    """Save an uploaded PDF under a unique name, extract its fields and remove it again.
+    
+    ``save`` is called with the destination path, e.g. ``FileStorage.save``.
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}")
+    try:
+        save(pdf_path)
+        return extract_document(pdf_path)
+    finally:
+        # Clean up the temporary file
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+def upload_size(stream):
+    """Return the size in bytes of an uploaded file's stream without reading it."""
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+def open_archive(fileobj):
+    """Open an uploaded ZIP archive with the configured zip-bomb limits."""
+    return ZipMembers(
+        fileobj,
+        max_members=app.config['ZIP_MAX_MEMBERS'],
+        max_ratio=app.config['ZIP_MAX_RATIO'],
+        max_total_bytes=app.config['ZIP_MAX_UNCOMPRESSED'],
+        max_member_bytes=app.config['MAX_CONTENT_LENGTH']
+    )
+
 # Common regex patterns
 DEFAULT_PATTERNS = {
     'emails': r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
@@ -132,37 +226,45 @@ def upload_file():
     # List to store all extracted data
     all_results = []
     
-    for file in files:
-        if file and allowed_file(file.filename):
-            # Secure the filename and create unique name
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_filename = f"{timestamp}_{filename}"
+    def process(original_name, save):
+        # Secure the filename
+        filename = secure_filename(original_name)
+        
+        try:
+            # Process the PDF
+            fields = extract_upload(save, filename)
             
-            # Save the uploaded file
-            pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(pdf_path)
+            # Add filename to fields
+            fields['Source_File'] = filename
             
+            # Add to results list
+            all_results.append(fields)
+                
+        except Exception as e:
+            flash(f'Error processing {filename}: {str(e)}')
+    
+    for file in files:
+        if file and is_zip(file.filename):
+            # Feed archive members into extraction one at a time
             try:
-                # Process the PDF
-                with PDFFieldExtractor(pdf_path) as extractor:
-                    # Extract fields
-                    fields = extractor.extract_fields()
-                    
-                    # Add filename to fields
-                    fields['Source_File'] = filename
-                    
-                    # Add to results list
-                    all_results.append(fields)
-                    
-                # Clean up the temporary file
-                os.remove(pdf_path)
-                    
-            except Exception as e:
-                flash(f'Error processing {filename}: {str(e)}')
+                with open_archive(file.stream) as archive:
+                    for member_name, save in archive:
+                        if archive.exhausted:
+                            flash(f'Stopped reading {file.filename}: archive exceeds the uncompressed size limit')
+                            break
+                        if allowed_file(member_name):
+                            process(member_name, save)
+                        else:
+                            flash(f'Skipped {member_name} in {file.filename}: not a PDF file')
+            except (zipfile.BadZipFile, ArchiveLimitExceeded) as e:
+                flash(f'Error reading archive {file.filename}: {str(e)}')
+        elif file and allowed_file(file.filename):
+            if upload_size(file.stream) > app.config['MAX_CONTENT_LENGTH']:
+                flash(f'Skipped {file.filename}: file is larger than the size limit')
                 continue
+            process(file.filename, file.save)
         else:
-            flash(f'Invalid file type for {file.filename}. Please upload only PDF files.')
+            flash(f'Invalid file type for {file.filename}. Please upload only PDF or ZIP files.')
     
     if not all_results:
         flash('No data could be extracted from the uploaded files.')
@@ -179,7 +281,7 @@ def upload_file():
         # Create Excel file
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         excel_filename = f'extracted_data_{timestamp}.xlsx'
-        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], excel_filename)
+        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex[:8]}_{excel_filename}')
         
         # Create Excel writer with xlsxwriter engine for better formatting
         with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
@@ -231,11 +333,259 @@ def download_file(filename):
         flash(f'Error downloading file: {str(e)}')
         return redirect(url_for('dashboard'))
 
+@app.route('/templates/learn', methods=['POST'])
+@login_required
+def learn_template():
+    """Teach the template index a layout from a PDF and its confirmed field values.
+    
+    The index is shared by every user, so only ``TEMPLATE_ADMINS`` may change it.
+    """
+    if current_user.username not in app.config['TEMPLATE_ADMINS']:
+        return jsonify({'error': 'Only template administrators can teach layouts'}), 403
+    
+    file = request.files.get('file')
+    if not file or not allowed_file(file.filename):
+        return jsonify({'error': 'A PDF file is required'}), 400
+    
+    confirmed = {
+        field: request.form[field]
+        for field in PDFFieldExtractor.FIELD_PATTERNS
+        if request.form.get(field)
+    }
+    if not confirmed:
+        return jsonify({'error': 'No confirmed field values given'}), 400
+    
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+    try:
+        file.save(pdf_path)
+        words = first_page_words(pdf_path)
+    finally:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+    
+    try:
+        template = learn_and_save(app.config['TEMPLATE_INDEX_PATH'], words, confirmed,
+                                name=request.form.get('name') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'template': template.name, 'fields': sorted(template.fields)})
+
 @app.route('/patterns', methods=['GET'])
 @login_required
 def get_patterns():
     return jsonify(DEFAULT_PATTERNS)
 
+@app.route('/patterns/stats', methods=['GET'])
+@login_required
+def get_pattern_stats():
+    """Report the slowest patterns seen by this worker and any risky constructs found in them."""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'slowest': safe_regex.stats.slowest(limit),
+        'warnings': safe_regex.pattern_warnings()
+    })
+
+def api_error(message, status):
+    return jsonify({'error': message}), status
+
+def api_token_required(view):
+    """Authenticate an API request with an ``Authorization: Bearer <token>`` header."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return api_error('Missing API token', 401)
+        api_token = ApiToken.authenticate(token.strip())
+        if api_token is None:
+            return api_error('Invalid API token', 401)
+        
+        api_token.last_used = datetime.utcnow()
+        db.session.commit()
+        g.api_user = api_token.user
+        return view(*args, **kwargs)
+    return wrapped
+
+def check_body_length(limit):
+    """Refuse a raw request body over ``limit`` bytes.
+    
+    Werkzeug only applies ``MAX_CONTENT_LENGTH`` when parsing form data, so
+    bodies read straight from ``request.stream`` have to be checked here.
+    """
+    if limit and request.content_length and request.content_length > limit:
+        raise RequestEntityTooLarge()
+
+def copy_body(dst, limit):
+    """Copy the raw request body to ``dst``, stopping once it exceeds ``limit`` bytes."""
+    copied = 0
+    for chunk in iter(lambda: request.stream.read(1024 * 1024), b''):
+        copied += len(chunk)
+        if limit and copied > limit:
+            raise RequestEntityTooLarge()
+        dst.write(chunk)
+
+def api_uploads():
+    """Collect ``(filename, save, stream)`` for the files uploaded in an API request.
+    
+    Accepts either a multipart body with any number of file fields, or a raw
+    ``application/pdf`` or ``application/zip`` body named by the ``filename``
+    query argument.
+    
+    Raises:
+        ArchiveLimitExceeded: If a raw archive body is over ``MAX_ARCHIVE_LENGTH``
+        RequestEntityTooLarge: If a PDF is over ``MAX_CONTENT_LENGTH``
+    """
+    if request.mimetype == 'multipart/form-data':
+        uploads = [
+            (file.filename, file.save, file.stream)
+            for field in request.files
+            for file in request.files.getlist(field)
+            if file.filename
+        ]
+        for filename, _, stream in uploads:
+            if not is_zip(filename) and upload_size(stream) > app.config['MAX_CONTENT_LENGTH']:
+                raise RequestEntityTooLarge()
+    elif request.mimetype == 'application/pdf':
+        check_body_length(app.config['MAX_CONTENT_LENGTH'])
+        # Read the whole body now, so a streamed body over the limit fails the request
+        body = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        g.setdefault('spooled', []).append(body)
+        copy_body(body, app.config['MAX_CONTENT_LENGTH'])
+        def save_body(pdf_path):
+            body.seek(0)
+            with open(pdf_path, 'wb') as f:
+                shutil.copyfileobj(body, f, 1024 * 1024)
+        uploads = [(request.args.get('filename') or 'document.pdf', save_body, body)]
+    elif request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+        check_body_length(app.config['MAX_ARCHIVE_LENGTH'])
+        body = spool(request.stream, max_bytes=app.config['MAX_ARCHIVE_LENGTH'])
+        g.setdefault('spooled', []).append(body)
+        uploads = [(request.args.get('filename') or 'documents.zip', None, body)]
+    else:
+        uploads = []
+    return uploads
+
+def api_documents(uploads):
+    """Expand uploads into ``(filename, save)`` pairs, one per PDF.
+    
+    ZIP archives are expanded into their members, which are only
+    decompressed when extracted.
+    
+    Raises:
+        zipfile.BadZipFile: If an archive is not a valid ZIP file
+        ArchiveLimitExceeded: If an archive has too many members
+    """
+    documents = []
+    for filename, save, stream in uploads:
+        if is_zip(filename):
+            archive = open_archive(stream)
+            g.setdefault('archives', []).append(archive)
+            documents.extend(archive)
+        else:
+            documents.append((filename, save))
+    return documents
+
+@app.teardown_request
+def close_archives(exc):
+    for archive in g.pop('archives', []):
+        archive.close()
+    # Spooled raw bodies; ZipFile leaves file objects it was given open
+    for body in g.pop('spooled', []):
+        body.close()
+
+def api_extract_one(filename, save):
+    """Extract one API document into its compact result record."""
+    if not allowed_file(filename):
+        return {'file': filename, 'error': 'Not a PDF file'}
+    filename = secure_filename(filename)
+    try:
+        return {'file': filename, 'fields': extract_upload(save, filename)}
+    except Exception as e:
+        return {'file': filename, 'error': str(e)}
+
+@app.route('/api/v1/tokens', methods=['POST'])
+@login_required
+def create_api_token():
+    """Issue an API token for the logged-in user. The token is only shown once."""
+    api_token, token = ApiToken.issue(current_user, name=request.form.get('name'))
+    db.session.commit()
+    return jsonify({'id': api_token.id, 'name': api_token.name, 'token': token}), 201
+
+@app.route('/api/v1/extract', methods=['POST'])
+@api_token_required
+def api_extract():
+    """Extract fields from one or many PDFs or ZIP archives and answer with JSON or NDJSON.
+    
+    NDJSON is chosen with ``?format=ndjson`` or ``Accept: application/x-ndjson``
+    and streams one line per document as it is extracted. Responses are
+    gzip-compressed when the client accepts it.
+    """
+    try:
+        uploads = api_uploads()
+        # An archive counts as one file here, ZIP_MAX_MEMBERS bounds its members
+        if len(uploads) > app.config['API_MAX_BATCH']:
+            return api_error(f"Too many files, at most {app.config['API_MAX_BATCH']} per request", 413)
+        documents = api_documents(uploads)
+    except zipfile.BadZipFile as e:
+        return api_error(f'Invalid ZIP archive: {e}', 400)
+    except ArchiveLimitExceeded as e:
+        return api_error(str(e), 413)
+    except RequestEntityTooLarge:
+        return api_error(f"Document too large, at most {app.config['MAX_CONTENT_LENGTH']} bytes per PDF", 413)
+    if not documents:
+        return api_error('No PDF documents in request', 400)
+    
+    use_gzip = 'gzip' in request.accept_encodings
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    
+    if not ndjson:
+        results = [api_extract_one(filename, save) for filename, save in documents]
+        body = json.dumps({'documents': results}, separators=(',', ':')).encode('utf-8')
+        response = app.response_class(gzip.compress(body) if use_gzip else body, mimetype='application/json')
+    else:
+        def generate():
+            compressor = zlib.compressobj(wbits=31) if use_gzip else None  # wbits=31 writes a gzip stream
+            for filename, save in documents:
+                line = json.dumps(api_extract_one(filename, save), separators=(',', ':')).encode('utf-8') + b'\n'
+                yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else line
+            if compressor:
+                yield compressor.flush()
+        response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.cli.command('check-patterns')
+def check_patterns_command():
+    """Report field patterns prone to catastrophic backtracking."""
+    patterns = []
+    for name, info in PDFFieldExtractor.FIELD_PATTERNS.items():
+        patterns.append((name, info['pattern'], re.IGNORECASE))
+        patterns += [(f'{name}:label:{label}', PDFFieldExtractor.label_pattern(label), 0) for label in info['labels']]
+    patterns += [(name, pattern, 0) for name, pattern in DEFAULT_PATTERNS.items()]
+    found = False
+    for name, pattern, flags in patterns:
+        for warning in safe_regex.analyse(pattern, flags):
+            click.echo(f'{name}: {warning}')
+            found = True
+    if not found:
+        click.echo('No risky patterns found')
+
+@app.cli.command('create-api-token')
+@click.argument('username')
+@click.option('--name', help='Label to recognise the token by')
+def create_api_token_command(username, name):
+    """Issue an API token for USERNAME."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'No user named {username}')
+    _, token = ApiToken.issue(user, name=name)
+    db.session.commit()
+    click.echo(token)
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import zipfile
+from typing import Callable, List, Optional, Tuple
+
+
+class ArchiveLimitExceeded(Exception):
+    """Raised when a ZIP archive goes over its member count, size or ratio limits."""
+
+
+def is_zip(filename: str) -> bool:
+    return filename.lower().endswith('.zip')
+
+
+class ZipMembers:
+    """Read the files of an uploaded ZIP archive one member at a time.
+
+    Nothing is extracted up front: each member is only decompressed when its
+    ``save`` callback is called, straight into the path extraction reads it
+    from. Limits are enforced on the bytes actually decompressed, not on the
+    sizes the archive claims, so a zip bomb is cut off as soon as it goes
+    over budget.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fileobj, max_members: int = 1000, max_ratio: float = 100,
+                 max_total_bytes: int = 512 * 1024 * 1024, max_member_bytes: Optional[int] = None):
+        """Open an archive.
+
+        Args:
+            fileobj: Seekable file object holding the ZIP archive
+            max_members (int): Maximum number of files in the archive
+            max_ratio (float): Maximum uncompressed to compressed size ratio per member
+            max_total_bytes (int): Maximum uncompressed bytes across all members
+            max_member_bytes (int): Maximum uncompressed bytes of a single member
+
+        Raises:
+            zipfile.BadZipFile: If the file is not a ZIP archive
+            ArchiveLimitExceeded: If the archive has too many members
+        """
+        self.zip = zipfile.ZipFile(fileobj)
+        self.max_ratio = max_ratio
+        self.max_total_bytes = max_total_bytes
+        self.max_member_bytes = max_member_bytes
+        self.total_bytes = 0
+
+        self.members = [
+            info for info in self.zip.infolist()
+            if not info.is_dir() and not self._is_metadata(info.filename)
+        ]
+        if len(self.members) > max_members:
+            raise ArchiveLimitExceeded(f'archive has {len(self.members)} files, at most {max_members} allowed')
+
+    @staticmethod
+    def _is_metadata(name: str) -> bool:
+        """Skip the resource forks and dotfiles macOS adds to archives."""
+        return name.startswith('__MACOSX/') or os.path.basename(name).startswith('.')
+
+    def __iter__(self):
+        return iter(self.entries())
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the archive has used up its uncompressed byte budget."""
+        return self.total_bytes >= self.max_total_bytes
+
+    def entries(self) -> List[Tuple[str, Callable[[str], None]]]:
+        """Return ``(filename, save)`` pairs; ``save(path)`` decompresses the member to ``path``."""
+        return [(os.path.basename(info.filename), self._saver(info)) for info in self.members]
+
+    def _saver(self, info: zipfile.ZipInfo) -> Callable[[str], None]:
+        def save(path: str):
+            self._check_declared(info)
+            limit = max(info.compress_size, 1) * self.max_ratio
+            written = 0
+            with self.zip.open(info) as src, open(path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(self.CHUNK_SIZE), b''):
+                    written += len(chunk)
+                    self.total_bytes += len(chunk)
+                    if written > limit:
+                        raise ArchiveLimitExceeded(f'{info.filename} exceeds the compression ratio limit')
+                    if self.max_member_bytes and written > self.max_member_bytes:
+                        raise ArchiveLimitExceeded(f'{info.filename} exceeds the file size limit')
+                    if self.total_bytes > self.max_total_bytes:
+                        raise ArchiveLimitExceeded('archive exceeds the uncompressed size limit')
+                    dst.write(chunk)
+        return save
+
+    def _check_declared(self, info: zipfile.ZipInfo):
+        """Refuse members whose header already announces they are over budget."""
+        if self.total_bytes + info.file_size > self.max_total_bytes:
+            raise ArchiveLimitExceeded('archive exceeds the uncompressed size limit')
+        if info.file_size > max(info.compress_size, 1) * self.max_ratio:
+            raise ArchiveLimitExceeded(f'{info.filename} exceeds the compression ratio limit')
+        if self.max_member_bytes and info.file_size > self.max_member_bytes:
+            raise ArchiveLimitExceeded(f'{info.filename} exceeds the file size limit')
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def spool(stream, max_size: int = 8 * 1024 * 1024, max_bytes: Optional[int] = None):
+    """Copy a non-seekable stream into a spooled temporary file ZipFile can seek in.
+
+    Raises:
+        ArchiveLimitExceeded: If the stream is longer than ``max_bytes``
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    copied = 0
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        copied += len(chunk)
+        if max_bytes and copied > max_bytes:
+            spooled.close()
+            raise ArchiveLimitExceeded('archive exceeds the upload size limit')
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
@@ -0,0 +1,83 @@
+"""Compare the JSON extraction API with the HTML form flow an integration scrapes.
+
+Usage: python bench_api.py [--rounds N] PDF [PDF ...]
+
+Both paths run through the Flask test client against a throwaway database,
+so the numbers cover request handling, extraction and result encoding but
+not the network.
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from app import app, db
+from models import User, ApiToken
+
+
+def form_round(client, payloads):
+    """Log in, upload through /upload and read the spreadsheet back, like the ERP scraper."""
+    client.post('/login', data={'username': 'bench', 'password': 'benchpass'})
+    data = {'files[]': [(io.BytesIO(body), name) for name, body in payloads]}
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+    rows = pd.read_excel(io.BytesIO(response.data)).to_dict('records')
+    client.get('/logout')
+    return len(rows)
+
+
+def api_round(client, payloads, token):
+    """Post the same batch to /api/v1/extract and decode the JSON."""
+    data = {'files[]': [(io.BytesIO(body), name) for name, body in payloads]}
+    response = client.post('/api/v1/extract', data=data, content_type='multipart/form-data',
+                           headers={'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'})
+    body = response.data
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return len(json.loads(body)['documents'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = []
+    for pdf_path in args.pdfs:
+        with open(pdf_path, 'rb') as f:
+            payloads.append((os.path.basename(pdf_path), f.read()))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app.config.update(
+            TESTING=True,
+            WTF_CSRF_ENABLED=False,
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            UPLOAD_FOLDER=tmp_dir,
+        )
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', email='bench@example.com')
+            user.set_password('benchpass')
+            db.session.add(user)
+            _, token = ApiToken.issue(user, name='bench')
+            db.session.commit()
+
+        with app.test_client() as client:
+            for label, run in (('form', lambda: form_round(client, payloads)),
+                               ('api', lambda: api_round(client, payloads, token))):
+                run()  # warm up caches and lazy imports
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    run()
+                elapsed = time.perf_counter() - start
+                print(f'{label:<5} {elapsed / args.rounds * 1000:8.1f} ms/request, '
+                      f'{len(payloads) * args.rounds / elapsed:8.1f} documents/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,37 @@ class Config:
     
     # Upload config
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    UPLOAD_FOLDER = 'uploads'
+    # Request size limit of the upload endpoints, so a ZIP of a few hundred invoices fits.
+    # Each PDF in a request, including ZIP archive members, is still held to MAX_CONTENT_LENGTH.
+    MAX_ARCHIVE_LENGTH = int(os.environ.get('MAX_ARCHIVE_LENGTH') or 256) * 1024 * 1024  # MB
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
+    
+    # Isolated extraction config (each PDF runs in a sandboxed subprocess)
+    EXTRACTION_ISOLATED = os.environ.get('EXTRACTION_ISOLATED', '').lower() in ('1', 'true', 'yes')
+    EXTRACTION_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT') or 60)  # seconds per document, keep well below gunicorn --timeout
+    EXTRACTION_MEMORY_LIMIT = int(os.environ.get('EXTRACTION_MEMORY_LIMIT') or 1024) * 1024 * 1024  # MB
+    EXTRACTION_MAX_PAGES = int(os.environ.get('EXTRACTION_MAX_PAGES') or 200)
+    EXTRACTION_MAX_TASKS_PER_WORKER = int(os.environ.get('EXTRACTION_MAX_TASKS_PER_WORKER') or 50)
+    
+    # Vendor template index used to route known layouts to fast extractors
+    TEMPLATE_INDEX_PATH = os.environ.get('TEMPLATE_INDEX_PATH') or 'template_index.json'
+    # Usernames allowed to teach the shared index over HTTP; empty means CLI only
+    TEMPLATE_ADMINS = [name.strip() for name in (os.environ.get('TEMPLATE_ADMINS') or '').split(',') if name.strip()]
+    
+    # Compressed page-text store, so pattern changes can re-match without re-parsing PDFs
+    TEXT_STORE_PATH = os.environ.get('TEXT_STORE_PATH')  # disabled when unset
+    
+    # JSON API config
+    API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH') or 100)  # files per request, a ZIP archive counts as one
+    
+    # ZIP upload limits (zip-bomb guard)
+    ZIP_MAX_MEMBERS = int(os.environ.get('ZIP_MAX_MEMBERS') or 1000)
+    ZIP_MAX_RATIO = float(os.environ.get('ZIP_MAX_RATIO') or 100)  # uncompressed / compressed per member
+    ZIP_MAX_UNCOMPRESSED = int(os.environ.get('ZIP_MAX_UNCOMPRESSED') or 512) * 1024 * 1024  # MB
+    
+    # Pattern matching limits (the time budget needs the regex package)
+    REGEX_TIMEOUT = float(os.environ.get('REGEX_TIMEOUT') or 0.25)  # seconds per search
+    REGEX_MAX_WINDOW = int(os.environ.get('REGEX_MAX_WINDOW') or 0)  # characters a pattern may scan, 0 for all
     
     # Azure AD SSO config (for future use)
     AZURE_CLIENT_ID = os.environ.get('AZURE_CLIENT_ID')
@@ -0,0 +1,388 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+try:
+    import fcntl  # Unix only
+except ImportError:
+    fcntl = None
+
+# Size in points of the grid word positions are snapped to
+GRID = 20
+# Number of label words from the top of the first page used for the signature
+SIGNATURE_WORDS = 60
+# Minimum Jaccard similarity for a layout to count as a known template
+MATCH_THRESHOLD = 0.6
+# Slack in points around a learned field box
+BOX_PADDING = 2
+
+
+def _normalize(text: str) -> str:
+    """Reduce text to lowercase letters and digits for value comparison."""
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+
+def _label(word: str) -> Optional[str]:
+    """Return the normalized form of a label-like word, or None for data words."""
+    if any(char.isdigit() for char in word):
+        return None
+    label = re.sub(r'[^a-z]', '', word.lower())
+    return label if len(label) > 1 else None
+
+
+def layout_tokens(words: List[Tuple]) -> List[str]:
+    """Compute the layout tokens of a page from its words.
+
+    Args:
+        words (List[Tuple]): Words as returned by ``page.get_text('words')``
+
+    Returns:
+        List[str]: Sorted ``label@x,y`` tokens of the label words at the top of the page
+    """
+    labels = []
+    for x0, y0, x1, y1, text, *_ in sorted(words, key=lambda w: (w[1], w[0])):
+        label = _label(text)
+        if label:
+            labels.append(f'{label}@{int(x0 // GRID)},{int(y0 // GRID)}')
+            if len(labels) >= SIGNATURE_WORDS:
+                break
+    return sorted(set(labels))
+
+
+def signature(tokens: List[str]) -> str:
+    """Return a short hash of a list of layout tokens."""
+    return hashlib.sha1('|'.join(tokens).encode('utf-8')).hexdigest()[:16]
+
+
+class Template:
+    """A known supplier layout and the positions of its fields."""
+
+    def __init__(self, name: str, tokens: List[str], fields: Dict[str, Dict]):
+        self.name = name
+        self.tokens = tokens
+        self.token_set = frozenset(tokens)
+        self.signature = signature(tokens)
+        self.fields = fields
+
+    def similarity(self, token_set: frozenset) -> float:
+        """Jaccard similarity between this template and a page's layout tokens."""
+        if not self.token_set and not token_set:
+            return 1.0
+        return len(self.token_set & token_set) / len(self.token_set | token_set)
+
+    def extract(self, words: List[Tuple]) -> Dict[str, str]:
+        """Read the raw text of each known field from its learned position.
+
+        Args:
+            words (List[Tuple]): Words of the first page
+
+        Returns:
+            Dict[str, str]: Field names mapped to the text found in their box
+        """
+        results = {}
+        for field_name, field in self.fields.items():
+            dx, dy = self._anchor_shift(words, field.get('anchor'))
+            x0, y0, x1, y1 = field['bbox']
+            x0, y0 = x0 + dx - BOX_PADDING, y0 + dy - BOX_PADDING
+            x1, y1 = x1 + dx + BOX_PADDING, y1 + dy + BOX_PADDING
+
+            inside = [
+                w for w in words
+                if x0 <= (w[0] + w[2]) / 2 <= x1 and y0 <= (w[1] + w[3]) / 2 <= y1
+            ]
+            if inside:
+                inside.sort(key=lambda w: (round(w[1]), w[0]))
+                results[field_name] = ' '.join(w[4] for w in inside)
+        return results
+
+    @staticmethod
+    def _anchor_shift(words: List[Tuple], anchor: Optional[Dict]) -> Tuple[float, float]:
+        """Offset between the learned anchor position and where it is on this page."""
+        if not anchor:
+            return 0.0, 0.0
+        candidates = [w for w in words if _label(w[4]) == anchor['text']]
+        if not candidates:
+            return 0.0, 0.0
+        nearest = min(candidates, key=lambda w: abs(w[0] - anchor['x']) + abs(w[1] - anchor['y']))
+        return nearest[0] - anchor['x'], nearest[1] - anchor['y']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'tokens': self.tokens, 'fields': self.fields}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Template':
+        return cls(data['name'], data['tokens'], data['fields'])
+
+
+def locate_value(words: List[Tuple], value: str, max_words: int = 8) -> Optional[Dict[str, Any]]:
+    """Find where a confirmed value sits on the page.
+
+    Args:
+        words (List[Tuple]): Words of the first page
+        value (str): Confirmed field value
+        max_words (int): Longest run of words a value may span
+
+    Returns:
+        Dict[str, Any]: ``bbox`` of the value and the ``anchor`` label before it, or None
+    """
+    target = _normalize(str(value))
+    if not target:
+        return None
+
+    lines: Dict[Tuple[int, int], List[Tuple]] = {}
+    for w in words:
+        lines.setdefault((w[5], w[6]), []).append(w)
+
+    for line in lines.values():
+        line.sort(key=lambda w: w[7])
+        for start in range(len(line)):
+            for end in range(start + 1, min(start + max_words, len(line)) + 1):
+                run = line[start:end]
+                if _normalize(''.join(w[4] for w in run)) != target:
+                    continue
+                bbox = [min(w[0] for w in run), min(w[1] for w in run),
+                        max(w[2] for w in run), max(w[3] for w in run)]
+                return {'bbox': bbox, 'anchor': _find_anchor(words, line[:start], bbox)}
+    return None
+
+
+def _find_anchor(words: List[Tuple], before: List[Tuple], bbox: List[float]) -> Optional[Dict[str, Any]]:
+    """Pick the label nearest to a value: left of it on its line, else the line above."""
+    candidates = [w for w in reversed(before) if _label(w[4])]
+    if not candidates:
+        above = [w for w in words if w[3] <= bbox[1] and _label(w[4]) and w[2] >= bbox[0] and w[0] <= bbox[2]]
+        candidates = sorted(above, key=lambda w: bbox[1] - w[3])
+    if not candidates:
+        return None
+    anchor = candidates[0]
+    return {'text': _label(anchor[4]), 'x': anchor[0], 'y': anchor[1]}
+
+
+class TemplateIndex:
+    """Index of known layouts, persisted as JSON and looked up by fingerprint."""
+
+    def __init__(self, templates: Optional[List[Template]] = None, threshold: float = MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.templates: Dict[str, Template] = {}
+        self._by_signature: Dict[str, Template] = {}
+        for template in templates or []:
+            self.add(template)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def add(self, template: Template):
+        old = self.templates.get(template.name)
+        if old is not None:
+            self._by_signature.pop(old.signature, None)
+        self.templates[template.name] = template
+        self._by_signature[template.signature] = template
+
+    def match(self, words: List[Tuple]) -> Optional[Template]:
+        """Find the template for a first page, or None if the layout is unknown.
+
+        Args:
+            words (List[Tuple]): Words of the first page
+
+        Returns:
+            Template: Best matching template above the similarity threshold
+        """
+        tokens = layout_tokens(words)
+        exact = self._by_signature.get(signature(tokens))
+        if exact is not None:
+            return exact
+
+        token_set = frozenset(tokens)
+        best, best_score = None, self.threshold
+        for template in self.templates.values():
+            score = template.similarity(token_set)
+            if score >= best_score:
+                best, best_score = template, score
+        return best
+
+    def learn(self, words: List[Tuple], confirmed: Dict[str, Any], name: Optional[str] = None) -> Template:
+        """Create or update a template from a confirmed extraction.
+
+        Args:
+            words (List[Tuple]): Words of the first page
+            confirmed (Dict[str, Any]): Field names mapped to their confirmed values
+            name (str): Template name, defaults to the matching template or the signature
+
+        Returns:
+            Template: The learned template
+
+        Raises:
+            ValueError: If none of the confirmed values can be found on the page
+        """
+        tokens = layout_tokens(words)
+        existing = self.templates.get(name) if name else self.match(words)
+        fields = dict(existing.fields) if existing else {}
+
+        for field_name, value in confirmed.items():
+            if value in (None, ''):
+                continue
+            location = locate_value(words, value)
+            if location:
+                fields[field_name] = location
+        if not fields:
+            raise ValueError('None of the confirmed values were found on the first page')
+
+        template = Template(name or (existing.name if existing else signature(tokens)), tokens, fields)
+        self.add(template)
+        return template
+
+    def save(self, path: str):
+        """Write the index to ``path`` atomically."""
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'templates': [t.to_dict() for t in self.templates.values()]}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TemplateIndex':
+        """Read an index from ``path``; a missing file gives an empty index."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        return cls([Template.from_dict(t) for t in data.get('templates', [])])
+
+
+_index_cache: Dict[str, Tuple[float, TemplateIndex]] = {}
+
+
+def load_index(path: Optional[str]) -> Optional[TemplateIndex]:
+    """Load a template index, reusing the cached copy until the file changes."""
+    if not path:
+        return None
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    cached = _index_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, TemplateIndex.load(path))
+        _index_cache[path] = cached
+    return cached[1]
+
+
+def learn_and_save(path: str, words: List[Tuple], confirmed: Dict[str, Any],
+                  name: Optional[str] = None) -> Template:
+    """Learn a template into the index stored at ``path``.
+
+    The index is reloaded from disk under an exclusive lock on ``<path>.lock``,
+    so concurrent learns from several processes all end up in the file.
+
+    Args:
+        path (str): Path to the template index
+        words (List[Tuple]): Words of the first page
+        confirmed (Dict[str, Any]): Field names mapped to their confirmed values
+        name (str): Template name
+
+    Returns:
+        Template: The learned template
+
+    Raises:
+        ValueError: If none of the confirmed values can be found on the page
+    """
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            index = TemplateIndex.load(path)
+            template = index.learn(words, confirmed, name=name)
+            index.save(path)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return template
+
+
+def first_page_words(pdf_path: str) -> List[Tuple]:
+    """Return the words of the first page of a PDF."""
+    with fitz.open(pdf_path) as doc:
+        return doc[0].get_text('words') if doc.page_count else []
+
+
+def benchmark(index: TemplateIndex, samples: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Compare the generic and template paths on documents with confirmed values.
+
+    Args:
+        index (TemplateIndex): Index to route documents with
+        samples (List[Tuple]): ``(pdf_path, confirmed_fields)`` pairs
+
+    Returns:
+        Dict[str, Any]: Timings, template hit count and accuracy of both paths
+    """
+    from pdf_extractor import PDFFieldExtractor
+
+    stats = {'documents': len(samples), 'template_hits': 0,
+             'generic_seconds': 0.0, 'template_seconds': 0.0,
+             'generic_correct': 0, 'template_correct': 0, 'fields': 0}
+
+    for pdf_path, confirmed in samples:
+        results = {}
+        for mode, template_index in (('generic', None), ('template', index)):
+            start = time.perf_counter()
+            with PDFFieldExtractor(pdf_path, template_index=template_index) as extractor:
+                results[mode] = extractor.extract_fields()
+                if mode == 'template' and extractor.template_name:
+                    stats['template_hits'] += 1
+            stats[f'{mode}_seconds'] += time.perf_counter() - start
+
+        for field_name, value in confirmed.items():
+            stats['fields'] += 1
+            for mode in ('generic', 'template'):
+                if _normalize(str(results[mode].get(field_name) or '')) == _normalize(str(value)):
+                    stats[f'{mode}_correct'] += 1
+
+    return stats
+
+
+def _load_samples(paths: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Pair each PDF with the confirmed values stored next to it as ``<name>.json``."""
+    samples = []
+    for pdf_path in paths:
+        json_path = os.path.splitext(pdf_path)[0] + '.json'
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                samples.append((pdf_path, json.load(f)))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the vendor template index')
+    parser.add_argument('--index', default='template_index.json', help='Path to the template index')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    learn = commands.add_parser('learn', help='Learn templates from PDFs with confirmed <name>.json values')
+    learn.add_argument('pdfs', nargs='+')
+    learn.add_argument('--name', help='Template name (single PDF only)')
+
+    bench = commands.add_parser('bench', help='Benchmark template routing against the generic path')
+    bench.add_argument('pdfs', nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == 'learn':
+        for pdf_path, confirmed in _load_samples(args.pdfs):
+            try:
+                template = learn_and_save(args.index, first_page_words(pdf_path), confirmed, name=args.name)
+            except ValueError as e:
+                print(f'{pdf_path}: {e}')
+                continue
+            print(f'{pdf_path}: learned {template.name} ({len(template.fields)} fields)')
+    else:
+        stats = benchmark(TemplateIndex.load(args.index), _load_samples(args.pdfs))
+        print(f"Documents:       {stats['documents']} ({stats['template_hits']} matched a template)")
+        for mode in ('generic', 'template'):
+            accuracy = stats[f'{mode}_correct'] / stats['fields'] if stats['fields'] else 0.0
+            print(f"{mode.capitalize():<9} path: {stats[f'{mode}_seconds']:.3f}s, accuracy {accuracy:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""Load-test the web app under gunicorn with simulated concurrent users.
+
+Usage:
+    python loadtest.py --pdfs tests/test_data/*.pdf --users 10 --duration 30 --config gthread:3x4
+    python loadtest.py --pdfs invoices/*.pdf --config sync:3 --config gthread:3x4 --config gthread:6x2
+
+Each ``--config`` is ``<worker class>:<workers>[x<threads>]``; several configs
+run the same workload one after another and are compared in a table. Every
+run gets a fresh database and upload folder in a temporary directory.
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, Any, List, Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = 'loadtest-password'
+
+# Runs inside the temporary directory with the server's environment
+SETUP_SCRIPT = """
+import sys
+from app import app, db
+from models import User
+with app.app_context():
+    db.create_all()
+    for i in range(int(sys.argv[1])):
+        user = User(username=f'load{i}', email=f'load{i}@example.com')
+        user.set_password(sys.argv[2])
+        db.session.add(user)
+    db.session.commit()
+"""
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses so logins and failed uploads can be told apart."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Stats:
+    """Thread-safe collection of request latencies and errors per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.documents = 0
+
+    def record(self, endpoint: str, seconds: float, ok: bool, documents: int = 0):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+            if ok:
+                self.documents += documents
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def encode_multipart(files: List[tuple]) -> tuple:
+    """Encode ``(field, filename, data)`` tuples as a multipart/form-data body."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode('utf-8') + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class SimulatedUser(threading.Thread):
+    """Log in, browse the dashboard and upload PDF batches until the deadline."""
+
+    def __init__(self, base_url: str, username: str, pdfs: List[tuple], max_batch: int,
+                 deadline: float, stats: Stats, think_time: float):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.username = username
+        self.pdfs = pdfs
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.stats = stats
+        self.think_time = think_time
+        self.random = random.Random(username)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect
+        )
+
+    def request(self, endpoint: str, path: str, data: bytes = None, content_type: str = None,
+                ok_status=(200,), documents: int = 0) -> Optional[bytes]:
+        req = urllib.request.Request(self.base_url + path, data=data)
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=300) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            status, body = None, None
+        self.stats.record(endpoint, time.perf_counter() - start, status in ok_status, documents)
+        return body if status in ok_status else None
+
+    def login(self) -> bool:
+        page = self.request('GET /login', '/login')
+        match = re.search(rb'name="csrf_token"[^>]*value="([^"]+)"', page or b'')
+        form = f'username={self.username}&password={PASSWORD}'
+        if match:
+            form += f'&csrf_token={match.group(1).decode()}'
+        return self.request('POST /login', '/login', form.encode(), 'application/x-www-form-urlencoded',
+                            ok_status=(302,)) is not None
+
+    def run(self):
+        while time.time() < self.deadline:
+            if not self.login():
+                time.sleep(self.think_time)
+                continue
+            while time.time() < self.deadline:
+                self.request('GET /dashboard', '/dashboard')
+                batch = self.random.sample(self.pdfs, min(len(self.pdfs), self.random.randint(1, self.max_batch)))
+                body, content_type = encode_multipart([('files[]', name, data) for name, data in batch])
+                # A redirect back to the dashboard means nothing could be extracted
+                self.request('POST /upload', '/upload', body, content_type, documents=len(batch))
+                time.sleep(self.random.uniform(0, 2 * self.think_time))
+
+
+def children(pid: int) -> List[int]:
+    """Return the direct child process ids of ``pid`` using /proc (Linux only)."""
+    result = []
+    try:
+        # Children are listed under the thread that started them, e.g. a gthread worker thread
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                result.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return result
+
+
+def descendants(pid: int) -> List[int]:
+    """Return all child process ids of ``pid``, e.g. a worker's extraction sandboxes."""
+    direct = children(pid)
+    return direct + [grandchild for child in direct for grandchild in descendants(child)]
+
+
+def read_usage(pid: int) -> Optional[tuple]:
+    """Return ``(cpu_seconds, rss_bytes)`` of a process from /proc, or None if it is gone.
+
+    CPU time includes children the process has already reaped, such as
+    recycled or killed sandbox workers.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK')
+    # utime, stime, cutime and cstime
+    return sum(int(field) for field in fields[11:15]) / ticks, rss_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class WorkerSampler(threading.Thread):
+    """Sample CPU time and RSS of each gunicorn worker, including its own children."""
+
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.workers: Dict[int, Dict[str, float]] = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for worker in children(self.master_pid):
+                total_cpu, total_rss = 0.0, 0
+                for pid in [worker] + descendants(worker):
+                    usage = read_usage(pid)
+                    if usage:
+                        total_cpu += usage[0]
+                        total_rss += usage[1]
+                entry = self.workers.setdefault(worker, {'cpu_start': total_cpu, 'cpu': total_cpu, 'peak_rss': 0})
+                entry['cpu'] = max(entry['cpu'], total_cpu)
+                entry['peak_rss'] = max(entry['peak_rss'], total_rss)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def parse_config(spec: str) -> Dict[str, Any]:
+    """Parse ``<worker class>:<workers>[x<threads>]``, e.g. ``gthread:3x4``."""
+    match = re.fullmatch(r'(\w+):(\d+)(?:x(\d+))?', spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f'invalid config {spec!r}, expected e.g. sync:3 or gthread:3x4')
+    worker_class, workers, threads = match.groups()
+    return {'spec': spec, 'worker_class': worker_class, 'workers': int(workers), 'threads': int(threads or 1)}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=2).close()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start within {timeout}s')
+
+
+def run_config(config: Dict[str, Any], args, pdfs: List[tuple]) -> Dict[str, Any]:
+    """Start gunicorn with one worker configuration, run the workload and collect results."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, PYTHONPATH=APP_DIR, SECRET_KEY='loadtest',
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'loadtest.db')}",
+                   UPLOAD_FOLDER=os.path.join(tmp_dir, 'uploads'))
+        env.update(dict(item.split('=', 1) for item in args.env))
+        subprocess.run([sys.executable, '-c', SETUP_SCRIPT, str(args.users), PASSWORD],
+                       cwd=tmp_dir, env=env, check=True)
+
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn',
+             '--worker-class', config['worker_class'],
+             '--workers', str(config['workers']),
+             '--threads', str(config['threads']),
+             '--timeout', '300',
+             '--bind', f'127.0.0.1:{port}',
+             '--log-level', 'warning',
+             'app:app'],
+            cwd=tmp_dir, env=env
+        )
+        try:
+            wait_until_ready(base_url)
+            sampler = WorkerSampler(server.pid)
+            sampler.start()
+
+            stats = Stats()
+            start = time.time()
+            users = [
+                SimulatedUser(base_url, f'load{i}', pdfs, args.max_batch, start + args.duration,
+                              stats, args.think_time)
+                for i in range(args.users)
+            ]
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+            elapsed = time.time() - start
+            sampler.stop()
+        finally:
+            server.terminate()
+            server.wait(30)
+
+    return {'config': config, 'stats': stats, 'elapsed': elapsed, 'workers': sampler.workers}
+
+
+def print_report(result: Dict[str, Any]):
+    stats, elapsed = result['stats'], result['elapsed']
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f"\n=== {result['config']['spec']} ===")
+    print(f'{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, '
+          f'{stats.documents / elapsed:.1f} documents/s')
+    print(f"{'endpoint':<16}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for endpoint, values in sorted(stats.latencies.items()):
+        print(f'{endpoint:<16}{len(values):>8}{stats.errors[endpoint]:>8}'
+              f'{percentile(values, 50) * 1000:>10.1f}{percentile(values, 90) * 1000:>10.1f}'
+              f'{percentile(values, 99) * 1000:>10.1f}')
+    print(f"{'worker pid':<16}{'cpu s':>8}{'cpu %':>8}{'peak rss MB':>14}")
+    for pid, usage in sorted(result['workers'].items()):
+        cpu = usage['cpu'] - usage['cpu_start']
+        print(f"{pid:<16}{cpu:>8.1f}{cpu / elapsed * 100:>8.1f}{usage['peak_rss'] / 1024 / 1024:>14.1f}")
+
+
+def print_comparison(results: List[Dict[str, Any]]):
+    print("\n=== comparison ===")
+    print(f"{'config':<16}{'req/s':>8}{'docs/s':>8}{'upload p50':>12}{'upload p99':>12}{'errors %':>10}{'rss MB':>10}")
+    for result in results:
+        stats, elapsed = result['stats'], result['elapsed']
+        total = sum(len(v) for v in stats.latencies.values())
+        uploads = stats.latencies.get('POST /upload', [])
+        errors = sum(stats.errors.values()) / total * 100 if total else 0.0
+        rss = sum(w['peak_rss'] for w in result['workers'].values()) / 1024 / 1024
+        print(f"{result['config']['spec']:<16}{total / elapsed:>8.1f}{stats.documents / elapsed:>8.1f}"
+              f"{percentile(uploads, 50) * 1000:>12.1f}{percentile(uploads, 99) * 1000:>12.1f}"
+              f"{errors:>10.1f}{rss:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdfs', nargs='+', required=True, help='PDF files to draw upload batches from')
+    parser.add_argument('--config', action='append', type=parse_config,
+                        help='Worker model as <class>:<workers>[x<threads>], repeat to compare (default: sync:3)')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run each configuration')
+    parser.add_argument('--max-batch', type=int, default=5, help='Largest number of PDFs per upload')
+    parser.add_argument('--think-time', type=float, default=0.5, help='Mean pause between uploads in seconds')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the server, e.g. EXTRACTION_ISOLATED=1')
+    args = parser.parse_args()
+
+    pdfs = []
+    for pdf_path in args.pdfs:
+        with open(pdf_path, 'rb') as f:
+            pdfs.append((os.path.basename(pdf_path), f.read()))
+
+    results = []
+    for config in args.config or [parse_config('sync:3')]:
+        result = run_config(config, args, pdfs)
+        print_report(result)
+        results.append(result)
+
+    if len(results) > 1:
+        print_comparison(results)
+
+
+if __name__ == '__main__':
+    main()
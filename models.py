@@ -1,3 +1,5 @@
+import hashlib
+import secrets
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
@@ -21,4 +23,36 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
     
     def __repr__(self):
-        return f'<User {self.username}>' 
\ No newline at end of file
+        return f'<User {self.username}>'
+
+class ApiToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    name = db.Column(db.String(64))
+    token_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used = db.Column(db.DateTime)
+    
+    user = db.relationship('User', backref=db.backref('api_tokens', lazy=True))
+    
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def issue(cls, user, name=None):
+        """Create a token for a user; only its hash is stored, so the raw token is returned once."""
+        token = secrets.token_urlsafe(32)
+        api_token = cls(user=user, name=name, token_hash=cls.hash_token(token))
+        db.session.add(api_token)
+        return api_token, token
+    
+    @classmethod
+    def authenticate(cls, token):
+        api_token = cls.query.filter_by(token_hash=cls.hash_token(token)).first()
+        if api_token is None or not api_token.user.is_active:
+            return None
+        return api_token
+    
+    def __repr__(self):
+        return f'<ApiToken {self.name or self.id} for {self.user_id}>'
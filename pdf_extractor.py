@@ -5,6 +5,9 @@ import fitz  # PyMuPDF
 import pandas as pd
 import os
 
+from safe_regex import compile_pattern
+from textstore import document_hash
+
 def extract_variables_from_pdf(pdf_path: str, variable_patterns: Dict[str, str]) -> Dict[str, Any]:
     """
     Extract specific variables from a PDF file using regex patterns.
@@ -65,7 +68,7 @@ class PDFFieldExtractor:
     FIELD_PATTERNS = {
         'company_name': {
             'labels': ['company name', 'business name', 'supplier', 'vendor'],
-            'pattern': r'([A-Z][A-Za-z0-9\s\.,&]+(Ltd|Limited|Inc|LLC|LLP|Corporation|Corp|Company|Co)\b)',
+            'pattern': r'([A-Z][A-Za-z0-9\s\.,&]{1,100}(Ltd|Limited|Inc|LLC|LLP|Corporation|Corp|Company|Co)\b)',
             'type': 'text'
         },
         'document_number': {
@@ -100,62 +103,176 @@ class PDFFieldExtractor:
         }
     }
 
-    def __init__(self, pdf_path: str):
+    # Longest label suffix and value a label pattern looks at, which keeps every match linear
+    LABEL_VALUE_LENGTH = 200
+
+    @classmethod
+    def label_pattern(cls, label: str) -> str:
+        """Return the pattern that finds a label and the rest of its line."""
+        return rf'{label}[:\s]{{1,10}}([^\n]{{0,{cls.LABEL_VALUE_LENGTH}}})'
+
+    def __init__(self, pdf_path: str, template_index=None, text_store=None):
         """Initialize the PDF field extractor.
         
         Args:
             pdf_path (str): Path to the PDF file
+            template_index (TemplateIndex): Known vendor layouts to route documents to
+            text_store (TextStore): Store to reuse or save the parsed page text
         """
         self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
+        self.doc = fitz.open(pdf_path) if pdf_path else None
+        self.template_index = template_index
+        self.text_store = text_store
+        self.template_name = None
         self.extracted_fields = {}
+        self._pages = None
+        self._words = None
+
+    @classmethod
+    def from_text(cls, pages: List[str], words: List = None, template_index=None) -> 'PDFFieldExtractor':
+        """Create an extractor over already extracted text, without opening a PDF.
+        
+        Args:
+            pages (List[str]): Text of each page
+            words (List): Word boxes of the first page, needed for template routing
+            template_index (TemplateIndex): Known vendor layouts to route documents to
+            
+        Returns:
+            PDFFieldExtractor: Extractor that only runs the matching stage
+        """
+        extractor = cls(None, template_index=template_index)
+        extractor._pages = pages
+        extractor._words = words
+        return extractor
+
+    def page_texts(self) -> List[str]:
+        """Return the text of each page, parsing the PDF on first use."""
+        if self._pages is None:
+            self._pages = [page.get_text() for page in self.doc]
+        return self._pages
+
+    def first_page_words(self) -> List:
+        """Return the word boxes of the first page, parsing the PDF on first use."""
+        if self._words is None:
+            self._words = self.doc[0].get_text('words') if self.doc is not None and self.doc.page_count else []
+        return self._words
+
+    def _load_from_store(self):
+        """Reuse stored page text for this PDF, or parse it once and store it."""
+        doc_hash = document_hash(self.pdf_path)
+        record = self.text_store.get(doc_hash)
+        if record is not None:
+            self._pages, self._words = record['pages'], record.get('words')
+            return
+        self.text_store.put(doc_hash, self.page_texts(), self.first_page_words(),
+                            name=os.path.basename(self.pdf_path))
 
     def extract_fields(self) -> Dict[str, Any]:
         """Extract all defined fields from the PDF.
         
+        Documents whose first page matches a known template are read from the
+        template's field positions; fields the template does not cover or
+        cannot read fall back to the generic search.
+        
         Returns:
             Dict[str, Any]: Dictionary containing the extracted fields and their values
         """
-        # Extract text from all pages
-        full_text = ""
-        for page in self.doc:
-            full_text += page.get_text()
+        if self.text_store is not None and self.pdf_path and self._pages is None:
+            self._load_from_store()
+
+        if self.template_index:
+            self._extract_with_template()
+
+        missing = {
+            field_name: field_info for field_name, field_info in self.FIELD_PATTERNS.items()
+            if field_name not in self.extracted_fields
+        }
+        if not missing:
+            return self.extracted_fields
+
+        # Join the text of all pages
+        full_text = "".join(self.page_texts())
+        lower_text = full_text.lower()
 
         # Process each field
-        for field_name, field_info in self.FIELD_PATTERNS.items():
-            value = self._extract_field(full_text, field_info)
+        for field_name, field_info in missing.items():
+            value = self._extract_field(full_text, field_info, field_name, lower_text)
             if value:
                 self.extracted_fields[field_name] = value
 
         return self.extracted_fields
 
-    def _extract_field(self, text: str, field_info: Dict) -> str:
+    def _extract_with_template(self) -> bool:
+        """Extract the fields a matching template can read from their known positions.
+        
+        Returns:
+            bool: True if the layout matched a template
+        """
+        words = self.first_page_words()
+        if not words:
+            return False
+        template = self.template_index.match(words)
+        if template is None:
+            return False
+
+        regions = template.extract(words)
+        fields = {}
+        for field_name in template.fields:
+            field_info = self.FIELD_PATTERNS.get(field_name)
+            if field_info is None:
+                continue
+            region_text = regions.get(field_name)
+            value_match = None
+            if region_text:
+                value_match = compile_pattern(field_info['pattern'], re.IGNORECASE, field_name).search(region_text)
+            value = self._clean_value(value_match.group(0), field_info['type']) if value_match else None
+            if not value:
+                # The layout drifted or the box holds something else, let the generic path find this field
+                continue
+            fields[field_name] = value
+
+        self.template_name = template.name
+        self.extracted_fields.update(fields)
+        return True
+
+    def _extract_field(self, text: str, field_info: Dict, field_name: str = 'field',
+                       lower_text: str = None) -> str:
         """Extract a specific field from the text using its patterns and labels.
         
+        Patterns run through ``safe_regex``, so each search is bounded by the
+        per-match time budget and, if set, the field's ``window``; a search
+        that runs out of time counts as no match.
+        
         Args:
             text (str): Text to search in
             field_info (Dict): Field definition including labels and pattern
+            field_name (str): Name the pattern timings are reported under
+            lower_text (str): ``text.lower()``, if the caller already has it
             
         Returns:
             str: Extracted value or None if not found
         """
+        if lower_text is None:
+            lower_text = text.lower()
+        window = field_info.get('window')
+        value_pattern = compile_pattern(field_info['pattern'], re.IGNORECASE, field_name, window)
+
         # First try to find the field using labels
         for label in field_info['labels']:
             # Create a pattern that looks for the label followed by a value
-            label_pattern = rf'{label}[:\s]+(.*?)(?:\n|$)'
-            matches = re.finditer(label_pattern, text.lower())
+            label_search = compile_pattern(self.label_pattern(label), 0, f'{field_name}:label:{label}', window)
             
-            for match in matches:
+            for match in label_search.finditer(lower_text):
                 # Get the text after the label
                 value_text = match.group(1).strip()
                 # Try to extract the value using the field's pattern
-                value_match = re.search(field_info['pattern'], value_text, re.IGNORECASE)
+                value_match = value_pattern.search(value_text)
                 if value_match:
                     return self._clean_value(value_match.group(0), field_info['type'])
 
         # If no value found using labels, try the pattern directly
-        matches = re.finditer(field_info['pattern'], text, re.IGNORECASE)
-        for match in matches:
+        match = value_pattern.search(text)
+        if match:
             return self._clean_value(match.group(0), field_info['type'])
 
         return None
@@ -216,7 +333,8 @@ class PDFFieldExtractor:
 
     def close(self):
         """Close the PDF document."""
-        self.doc.close()
+        if self.doc is not None:
+            self.doc.close()
 
     def __enter__(self):
         return self
@@ -0,0 +1,328 @@
+import logging
+import re
+import string
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+try:
+    import regex  # Supports per-call timeouts, which the stdlib re module lacks
+except ImportError:
+    regex = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds a single search may run before it is abandoned (needs the regex module)
+MATCH_TIMEOUT = 0.25
+# Characters of input a pattern may look at, 0 for no limit; prefer bounded quantifiers
+MAX_WINDOW = 0
+# Matches slower than this are logged
+SLOW_MATCH_SECONDS = 0.1
+
+# Characters used to approximate what a character class can match
+_PROBE = frozenset(string.printable + '£€é')
+
+
+def configure(timeout: Optional[float] = None, window: Optional[int] = None):
+    """Set the per-match time budget and the default input window."""
+    global MATCH_TIMEOUT, MAX_WINDOW
+    if timeout is not None:
+        MATCH_TIMEOUT = timeout
+    if window is not None:
+        MAX_WINDOW = window
+
+
+class PatternStats:
+    """Per-pattern match timings, used to report the slowest patterns seen in traffic."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._patterns: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self._patterns.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0, 'truncated': 0})
+
+    def record(self, name: str, seconds: float, timed_out: bool = False, truncated: bool = False):
+        with self._lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['timeouts'] += timed_out
+            entry['truncated'] += truncated
+
+    def merge(self, other: Dict[str, Dict[str, float]]):
+        """Add timings collected elsewhere, e.g. in a sandbox worker."""
+        with self._lock:
+            for name, theirs in other.items():
+                entry = self._entry(name)
+                entry['calls'] += theirs['calls']
+                entry['total'] += theirs['total']
+                entry['max'] = max(entry['max'], theirs['max'])
+                entry['timeouts'] += theirs['timeouts']
+                entry['truncated'] += theirs.get('truncated', 0)
+
+    def drain(self) -> Dict[str, Dict[str, float]]:
+        """Return the collected timings and start over."""
+        with self._lock:
+            patterns, self._patterns = self._patterns, {}
+        return patterns
+
+    def slowest(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the patterns with the slowest single match first."""
+        with self._lock:
+            rows = [dict(entry, name=name) for name, entry in self._patterns.items()]
+        rows.sort(key=lambda row: (row['max'], row['total']), reverse=True)
+        return rows[:limit]
+
+
+stats = PatternStats()
+
+
+def _op(node) -> str:
+    return str(node[0])
+
+
+def _char_set(node, ignore_case: bool) -> Optional[frozenset]:
+    """Approximate the characters a single-character node matches, or None for other nodes."""
+    op, av = _op(node), node[1]
+    if op == 'LITERAL':
+        chars = {chr(av)}
+    elif op == 'NOT_LITERAL':
+        chars = _PROBE - {chr(av)}
+    elif op == 'ANY':
+        chars = _PROBE - {'\n'}
+    elif op == 'IN':
+        chars, negate = set(), False
+        for item in av:
+            item_op, item_av = _op(item), item[1]
+            if item_op == 'NEGATE':
+                negate = True
+            elif item_op == 'LITERAL':
+                chars.add(chr(item_av))
+            elif item_op == 'RANGE':
+                chars.update(c for c in _PROBE if item_av[0] <= ord(c) <= item_av[1])
+            elif item_op == 'CATEGORY':
+                chars.update(c for c in _PROBE if _in_category(c, str(item_av)))
+        if negate:
+            chars = _PROBE - chars
+    else:
+        return None
+    if ignore_case:
+        chars |= {c.swapcase() for c in chars}
+    return frozenset(chars)
+
+
+def _in_category(char: str, category: str) -> bool:
+    tests = {
+        'CATEGORY_DIGIT': char.isdigit(),
+        'CATEGORY_SPACE': char.isspace(),
+        'CATEGORY_WORD': char.isalnum() or char == '_',
+    }
+    if category.startswith('CATEGORY_NOT_'):
+        return not tests.get(category.replace('NOT_', ''), False)
+    return tests.get(category, False)
+
+
+def _repeat(node):
+    """Return ``(min, max, body)`` for a quantifier node, else None."""
+    if _op(node) in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+        return node[1]
+    return None
+
+
+def _leading(node):
+    """Descend through groups to the first node that consumes input."""
+    while _op(node) == 'SUBPATTERN' and len(node[1][-1]):
+        node = node[1][-1][0]
+    return node
+
+
+def _has_unbounded_repeat(seq) -> bool:
+    for node in seq:
+        repeat = _repeat(node)
+        if repeat and (repeat[1] == sre_parse.MAXREPEAT or _has_unbounded_repeat(repeat[2])):
+            return True
+        if _op(node) == 'SUBPATTERN' and _has_unbounded_repeat(node[1][-1]):
+            return True
+        if _op(node) == 'BRANCH' and any(_has_unbounded_repeat(branch) for branch in node[1][1]):
+            return True
+    return False
+
+
+def _first_chars(seq, ignore_case: bool) -> Optional[frozenset]:
+    for node in seq:
+        node = _leading(node)
+        if _op(node) == 'AT':
+            continue
+        repeat = _repeat(node)
+        if repeat:
+            return _first_chars(repeat[2], ignore_case)
+        if _op(node) == 'BRANCH':
+            sets = [_first_chars(branch, ignore_case) for branch in node[1][1]]
+            return None if None in sets else frozenset().union(*sets)
+        return _char_set(node, ignore_case)
+    return None
+
+
+def _has_ambiguous_branch(seq, ignore_case: bool) -> bool:
+    """True if an alternation in ``seq`` has an empty branch or branches that can start alike."""
+    for node in seq:
+        op = _op(node)
+        if op == 'BRANCH':
+            branches = node[1][1]
+            if any(not branch for branch in branches):
+                return True
+            sets = [_first_chars(branch, ignore_case) for branch in branches]
+            if any(a is not None and b is not None and a & b for j, a in enumerate(sets) for b in sets[j + 1:]):
+                return True
+            if any(_has_ambiguous_branch(branch, ignore_case) for branch in branches):
+                return True
+        elif op == 'SUBPATTERN' and _has_ambiguous_branch(node[1][-1], ignore_case):
+            return True
+    return False
+
+
+def _walk(seq, ignore_case: bool, warnings: List[str]):
+    for i, node in enumerate(seq):
+        op = _op(node)
+        repeat = _repeat(node)
+        if repeat:
+            low, high, body = repeat
+            unbounded = high == sre_parse.MAXREPEAT
+            body_chars = _char_set(body[0], ignore_case) if len(body) == 1 else None
+
+            if unbounded and _has_unbounded_repeat(body):
+                warnings.append('nested unbounded quantifiers (exponential backtracking)')
+            if unbounded and _has_ambiguous_branch(body, ignore_case):
+                warnings.append('quantified alternation with overlapping branches (exponential backtracking)')
+            if unbounded and body_chars and '\n' in body_chars and any(c.isalnum() for c in body_chars) \
+                    and any(_op(rest) != 'AT' for rest in seq[i + 1:]):
+                warnings.append('unbounded class spanning line breaks before a required suffix '
+                                '(quadratic over long text)')
+            if unbounded and body_chars and i + 1 < len(seq):
+                following = _repeat(_leading(seq[i + 1]))
+                if following and following[1] == sre_parse.MAXREPEAT and len(following[2]) == 1:
+                    following_chars = _char_set(following[2][0], ignore_case)
+                    if following_chars and body_chars & following_chars:
+                        warnings.append('adjacent unbounded quantifiers over overlapping characters '
+                                        '(polynomial backtracking)')
+            _walk(body, ignore_case, warnings)
+        elif op == 'SUBPATTERN':
+            _walk(node[1][-1], ignore_case, warnings)
+        elif op == 'BRANCH':
+            for branch in node[1][1]:
+                _walk(branch, ignore_case, warnings)
+        elif op in ('ASSERT', 'ASSERT_NOT'):
+            _walk(node[1][1], ignore_case, warnings)
+
+
+def analyse(pattern: str, flags: int = 0) -> List[str]:
+    """Flag constructs in a pattern that are prone to catastrophic backtracking.
+
+    Args:
+        pattern (str): Regular expression to check
+        flags (int): ``re`` flags the pattern is used with
+
+    Returns:
+        List[str]: Descriptions of the risky constructs found, empty if none
+    """
+    warnings: List[str] = []
+    _walk(sre_parse.parse(pattern, flags), bool(flags & re.IGNORECASE), warnings)
+    return list(dict.fromkeys(warnings))
+
+
+class SafePattern:
+    """A compiled pattern that searches under a time budget.
+
+    With the ``regex`` module installed each search is abandoned after
+    ``MATCH_TIMEOUT`` seconds and treated as no match. Without it the stdlib
+    ``re`` module is used and only the pattern's own bounded quantifiers
+    limit the work. An optional window stops the search at a fixed number of
+    characters; searches it cuts short are counted as ``truncated``. Every
+    call is timed into ``stats``.
+    """
+
+    def __init__(self, pattern: str, flags: int = 0, name: Optional[str] = None, window: Optional[int] = None):
+        self.pattern = pattern
+        self.name = name or pattern
+        self.window = window
+        self.compiled = (regex or re).compile(pattern, flags)
+        # Reported by `flask check-patterns` and /patterns/stats rather than on every compile
+        self.warnings = analyse(pattern, flags)
+        for warning in self.warnings:
+            logger.debug('Pattern %s: %s', self.name, warning)
+        _registry.append(self)
+
+    def _endpos(self, text: str) -> int:
+        window = self.window or MAX_WINDOW
+        return min(len(text), window) if window else len(text)
+
+    def _record(self, elapsed: float, text: str, timed_out: bool = False):
+        stats.record(self.name, elapsed, timed_out, truncated=self._endpos(text) < len(text))
+        if timed_out:
+            logger.warning('Pattern %s timed out after %.3fs on %d characters', self.name, elapsed, len(text))
+        elif elapsed > SLOW_MATCH_SECONDS:
+            logger.warning('Pattern %s took %.3fs on %d characters', self.name, elapsed, len(text))
+
+    def search(self, text: str):
+        """Return the first match in the window, or None if there is none or time ran out."""
+        start = time.perf_counter()
+        try:
+            match = self._search_from(text, 0)
+        except TimeoutError:
+            self._record(time.perf_counter() - start, text, timed_out=True)
+            return None
+        self._record(time.perf_counter() - start, text)
+        return match
+
+    def finditer(self, text: str) -> Iterator:
+        """Yield matches in the window until they run out or the time budget is spent.
+        
+        Only the time spent finding matches counts, not the caller's work between them.
+        """
+        elapsed, timed_out, pos = 0.0, False, 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    # Each step gets its own budget, so slow callers cannot use it up
+                    match = self._search_from(text, pos)
+                except TimeoutError:
+                    timed_out = True
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                if match is None:
+                    break
+                # Step past empty matches like re.finditer does
+                pos = match.end() if match.end() > match.start() else match.end() + 1
+                yield match
+        finally:
+            self._record(elapsed, text, timed_out)
+
+    def _search_from(self, text: str, pos: int):
+        if regex is not None:
+            return self.compiled.search(text, pos, self._endpos(text), timeout=MATCH_TIMEOUT)
+        return self.compiled.search(text, pos, self._endpos(text))
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str, flags: int = 0, name: Optional[str] = None,
+                    window: Optional[int] = None) -> SafePattern:
+    """Compile and analyse a pattern once per process."""
+    return SafePattern(pattern, flags, name, window)
+
+
+def pattern_warnings() -> Dict[str, List[str]]:
+    """Return the analysis warnings of every pattern compiled so far."""
+    return {pattern.name: pattern.warnings for pattern in list(_registry) if pattern.warnings}
+
+
+_registry: List[SafePattern] = []
@@ -0,0 +1,223 @@
+import multiprocessing
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+import safe_regex
+from fingerprint import load_index
+from textstore import open_store
+from pdf_extractor import PDFFieldExtractor
+
+
+class ExtractionFailed(Exception):
+    """Raised when extraction of a document fails in the sandbox, e.g. for a corrupt PDF."""
+
+
+class ExtractionBudgetExceeded(ExtractionFailed):
+    """Raised when a document goes over its time, memory or page budget."""
+
+
+# MuPDF reports failed allocations as RuntimeError("malloc (... bytes) failed")
+_MUPDF_OUT_OF_MEMORY = re.compile(r'^(?:malloc|calloc|realloc)\b.*\bfailed')
+
+
+def _out_of_memory(error: Exception) -> bool:
+    return isinstance(error, MemoryError) or (
+        isinstance(error, RuntimeError) and bool(_MUPDF_OUT_OF_MEMORY.match(str(error))))
+
+
+def _worker_main(conn, memory_limit: Optional[int], template_index_path: Optional[str],
+                 text_store_path: Optional[str], regex_limits: Optional[Tuple[float, int]]):
+    """Entry point of a sandbox worker process.
+
+    Receives ``(pdf_path, max_pages)`` tasks over ``conn`` and answers each
+    with ``('ok', fields, timings)``, ``('budget', message, timings)`` for a
+    document over its page budget, ``('memory', message, timings)`` before
+    exiting when the address-space cap is hit, or ``('error', message, timings)``,
+    where ``timings`` are the pattern timings collected for that document.
+    ``None`` stops the loop.
+    """
+    if regex_limits:
+        safe_regex.configure(*regex_limits)
+    if memory_limit and resource is not None:
+        # RLIMIT_RSS is not enforced on Linux, so cap the address space instead
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        pdf_path, max_pages = task
+        try:
+            with PDFFieldExtractor(pdf_path, template_index=load_index(template_index_path),
+                                   text_store=open_store(text_store_path)) as extractor:
+                page_count = extractor.doc.page_count
+                if max_pages and page_count > max_pages:
+                    conn.send(('budget', f'page limit exceeded ({page_count} > {max_pages} pages)', {}))
+                    continue
+                fields = extractor.extract_fields()
+            conn.send(('ok', fields, safe_regex.stats.drain()))
+        except Exception as e:
+            if _out_of_memory(e):
+                # The heap may be in a bad state, report and let the parent respawn us
+                conn.send(('memory', 'memory limit exceeded', {}))
+                break
+            conn.send(('error', str(e), safe_regex.stats.drain()))
+
+    conn.close()
+
+
+class _SandboxWorker:
+    """A single child process that extracts documents sent to it over a pipe."""
+
+    def __init__(self, context, memory_limit: Optional[int], template_index_path: Optional[str],
+                 text_store_path: Optional[str], regex_limits: Optional[Tuple[float, int]]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, daemon=True,
+                                       args=(child_conn, memory_limit, template_index_path,
+                                             text_store_path, regex_limits))
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+
+    def run(self, pdf_path: str, max_pages: Optional[int], timeout: float) -> Dict[str, Any]:
+        """Send a document to the child and wait at most ``timeout`` seconds for the result."""
+        self.conn.send((pdf_path, max_pages))
+        self.tasks_done += 1
+
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise ExtractionBudgetExceeded(f'time limit exceeded ({timeout:g}s)')
+
+        try:
+            status, payload, timings = self.conn.recv()
+        except EOFError:
+            # The child died without answering, most likely killed for memory
+            self.kill()
+            raise ExtractionBudgetExceeded('extraction process died (memory limit exceeded?)')
+
+        # Report the child's pattern timings from this process
+        safe_regex.stats.merge(timings)
+
+        if status == 'memory':
+            self.kill()
+        if status in ('budget', 'memory'):
+            raise ExtractionBudgetExceeded(payload)
+        if status != 'ok':
+            raise ExtractionFailed(payload)
+        return payload
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self):
+        """Ask the child to exit, killing it if it does not go quietly."""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ExtractionSandbox:
+    """Run PDF extraction in isolated child processes with per-document budgets.
+
+    Each document gets a wall-clock timeout, an address-space cap and a page
+    cap. Documents that go over budget have their worker killed and surface
+    as ``ExtractionBudgetExceeded``; other errors surface as
+    ``ExtractionFailed``. Workers are recycled after
+    ``max_tasks_per_worker`` documents so leaks in the native PDF libraries
+    cannot build up in long-running processes.
+    """
+
+    def __init__(self, timeout: float = 60, memory_limit: Optional[int] = None,
+                 max_pages: Optional[int] = None, max_tasks_per_worker: int = 50,
+                 template_index_path: Optional[str] = None, text_store_path: Optional[str] = None,
+                 regex_limits: Optional[Tuple[float, int]] = None):
+        """Initialize the sandbox.
+
+        Args:
+            timeout (float): Wall-clock seconds allowed per document
+            memory_limit (int): Address-space cap of a worker in bytes (Unix only)
+            max_pages (int): Maximum number of pages per document
+            max_tasks_per_worker (int): Documents a worker handles before it is replaced
+            template_index_path (str): Template index used to route known layouts
+            text_store_path (str): Page-text store to reuse or save parsed text
+            regex_limits (Tuple[float, int]): Pattern time budget and input window
+        """
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_pages = max_pages
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.template_index_path = template_index_path
+        self.text_store_path = text_store_path
+        self.regex_limits = regex_limits
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: List[_SandboxWorker] = []
+        self._lock = threading.Lock()
+
+    def extract(self, pdf_path: str) -> Dict[str, Any]:
+        """Extract the fields of a single PDF inside a sandbox worker.
+
+        Args:
+            pdf_path (str): Path to the PDF file
+
+        Returns:
+            Dict[str, Any]: Dictionary containing the extracted fields and their values
+
+        Raises:
+            ExtractionBudgetExceeded: If the document goes over its time, memory or page budget
+            ExtractionFailed: If extraction fails for any other reason
+        """
+        worker = self._acquire()
+        try:
+            return worker.run(pdf_path, self.max_pages, self.timeout)
+        finally:
+            self._release(worker)
+
+    def _acquire(self) -> _SandboxWorker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                worker.kill()
+        return _SandboxWorker(self._context, self.memory_limit, self.template_index_path,
+                              self.text_store_path, self.regex_limits)
+
+    def _release(self, worker: _SandboxWorker):
+        if not worker.alive or worker.tasks_done >= self.max_tasks_per_worker:
+            worker.stop()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def close(self):
+        """Stop all idle workers."""
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
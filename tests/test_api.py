@@ -0,0 +1,172 @@
+import os
+import io
+import sys
+import gzip
+import json
+import zipfile
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import User, ApiToken
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+
+@pytest.fixture
+def api_client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['UPLOAD_FOLDER'] = 'test_uploads'
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            user = User(username='apiuser', email='api@example.com')
+            user.set_password('apipass')
+            db.session.add(user)
+            _, token = ApiToken.issue(user, name='erp')
+            db.session.commit()
+        client.token = token
+        yield client
+    
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    if os.path.exists(app.config['UPLOAD_FOLDER']):
+        for file in os.listdir(app.config['UPLOAD_FOLDER']):
+            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], file))
+        os.rmdir(app.config['UPLOAD_FOLDER'])
+
+def auth(client):
+    return {'Authorization': f'Bearer {client.token}'}
+
+def read_sample():
+    with open(SAMPLE_PDF, 'rb') as pdf:
+        return pdf.read()
+
+def test_api_requires_token(api_client):
+    """Test that the API rejects missing and unknown tokens"""
+    response = api_client.post('/api/v1/extract')
+    assert response.status_code == 401
+    response = api_client.post('/api/v1/extract', headers={'Authorization': 'Bearer nope'})
+    assert response.status_code == 401
+
+def test_api_raw_body(api_client):
+    """Test extracting a single PDF sent as the raw request body"""
+    response = api_client.post('/api/v1/extract?filename=invoice.pdf', data=read_sample(),
+                               content_type='application/pdf', headers=auth(api_client))
+    assert response.status_code == 200
+    document, = response.json['documents']
+    assert document['file'] == 'invoice.pdf'
+    assert document['fields']['total_due'] == '1100.00'
+
+def test_api_multipart_batch_ndjson_gzip(api_client):
+    """Test a multipart batch answered as gzip-compressed NDJSON"""
+    data = {'files[]': [(io.BytesIO(read_sample()), 'a.pdf'), (io.BytesIO(b'not a pdf'), 'b.txt')]}
+    headers = dict(auth(api_client), **{'Accept-Encoding': 'gzip'})
+    response = api_client.post('/api/v1/extract?format=ndjson', data=data,
+                               content_type='multipart/form-data', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    
+    lines = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+    assert [line['file'] for line in lines] == ['a.pdf', 'b.txt']
+    assert 'fields' in lines[0]
+    assert 'error' in lines[1]
+
+def test_api_batch_limit(api_client):
+    """Test that batches over API_MAX_BATCH are refused"""
+    app.config['API_MAX_BATCH'] = 1
+    try:
+        data = {'files[]': [(io.BytesIO(read_sample()), 'a.pdf'), (io.BytesIO(read_sample()), 'b.pdf')]}
+        response = api_client.post('/api/v1/extract', data=data,
+                                   content_type='multipart/form-data', headers=auth(api_client))
+        assert response.status_code == 413
+    finally:
+        app.config['API_MAX_BATCH'] = 100
+
+def test_api_raw_pdf_size_limit(api_client, monkeypatch):
+    """Test that a raw PDF body over MAX_CONTENT_LENGTH is refused like a multipart upload"""
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = api_client.post('/api/v1/extract', data=read_sample() + b'\0' * 2048,
+                               content_type='application/pdf', headers=auth(api_client))
+    assert response.status_code == 413
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+def test_api_chunked_pdf_size_limit(api_client, monkeypatch):
+    """Test that a streamed raw PDF body without Content-Length is refused once over the limit"""
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = api_client.post('/api/v1/extract', input_stream=io.BytesIO(read_sample() + b'\0' * 2048),
+                               content_type='application/pdf',
+                               headers=dict(auth(api_client), **{'Transfer-Encoding': 'chunked'}),
+                               environ_overrides={'wsgi.input_terminated': True})
+    assert response.status_code == 413
+    assert 'error' in response.json
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+def test_api_batch_limit_counts_archive_once(api_client, monkeypatch):
+    """Test that a ZIP archive with more members than API_MAX_BATCH is accepted"""
+    monkeypatch.setitem(app.config, 'API_MAX_BATCH', 1)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+            zf.writestr(name, read_sample())
+    
+    response = api_client.post('/api/v1/extract', data=archive.getvalue(),
+                               content_type='application/zip', headers=auth(api_client))
+    assert response.status_code == 200
+    assert len(response.json['documents']) == 3
+
+def test_api_raw_zip(api_client):
+    """Test extracting the members of a ZIP archive sent as the raw body"""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('a.pdf', read_sample())
+        zf.writestr('b.pdf', read_sample())
+    
+    response = api_client.post('/api/v1/extract', data=archive.getvalue(),
+                               content_type='application/zip', headers=auth(api_client))
+    assert response.status_code == 200
+    assert [document['file'] for document in response.json['documents']] == ['a.pdf', 'b.pdf']
+    assert all('fields' in document for document in response.json['documents'])
+
+def test_api_raw_zip_size_limit(api_client, monkeypatch):
+    """Test that a raw ZIP body over MAX_ARCHIVE_LENGTH is refused"""
+    monkeypatch.setitem(app.config, 'MAX_ARCHIVE_LENGTH', 1024)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        zf.writestr('a.pdf', read_sample() + b'\0' * 2048)
+    
+    response = api_client.post('/api/v1/extract', data=archive.getvalue(),
+                               content_type='application/zip', headers=auth(api_client))
+    assert response.status_code == 413
+
+def test_api_zip_may_exceed_pdf_limit(api_client, monkeypatch):
+    """Test that an archive larger than MAX_CONTENT_LENGTH is accepted when its PDFs are not"""
+    sample = read_sample()
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', len(sample) + 1024)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+            zf.writestr(name, sample)
+    
+    data = {'files[]': (io.BytesIO(archive.getvalue()), 'batch.zip')}
+    response = api_client.post('/api/v1/extract', data=data,
+                               content_type='multipart/form-data', headers=auth(api_client))
+    assert response.status_code == 200
+    assert len(response.json['documents']) == 3
+    
+    data = {'files[]': (io.BytesIO(sample + b'\0' * 2048), 'big.pdf')}
+    response = api_client.post('/api/v1/extract', data=data,
+                               content_type='multipart/form-data', headers=auth(api_client))
+    assert response.status_code == 413
+
+def test_api_rejects_bad_zip(api_client):
+    """Test that a corrupt archive is refused"""
+    response = api_client.post('/api/v1/extract', data=b'not a zip',
+                               content_type='application/zip', headers=auth(api_client))
+    assert response.status_code == 400
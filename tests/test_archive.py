@@ -0,0 +1,74 @@
+import os
+import io
+import sys
+import zipfile
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from archive import ZipMembers, ArchiveLimitExceeded, spool
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+def test_members_are_saved_one_at_a_time(tmp_path):
+    """Test that each member is only decompressed when saved"""
+    with open(SAMPLE_PDF, 'rb') as pdf:
+        data = pdf.read()
+    archive = ZipMembers(make_zip({'a.pdf': data, 'nested/b.pdf': data, '__MACOSX/._a.pdf': b'x', 'dir/': b''}))
+    
+    names = [name for name, _ in archive]
+    assert names == ['a.pdf', 'b.pdf']
+    assert archive.total_bytes == 0
+    
+    _, save = archive.entries()[1]
+    save(str(tmp_path / 'b.pdf'))
+    assert (tmp_path / 'b.pdf').read_bytes() == data
+    assert archive.total_bytes == len(data)
+
+def test_member_count_limit():
+    """Test that archives with too many files are refused"""
+    with pytest.raises(ArchiveLimitExceeded):
+        ZipMembers(make_zip({f'{i}.pdf': b'%PDF' for i in range(3)}), max_members=2)
+
+def test_compression_ratio_limit(tmp_path):
+    """Test that highly compressed members are treated as zip bombs"""
+    archive = ZipMembers(make_zip({'bomb.pdf': b'\0' * (1024 * 1024)}), max_ratio=10)
+    (_, save), = archive
+    with pytest.raises(ArchiveLimitExceeded, match='ratio'):
+        save(str(tmp_path / 'bomb.pdf'))
+
+def test_total_size_limit(tmp_path):
+    """Test that the uncompressed total across members is capped"""
+    archive = ZipMembers(make_zip({'a.pdf': os.urandom(600), 'b.pdf': os.urandom(600)}), max_total_bytes=1000)
+    (_, save_a), (_, save_b) = archive
+    save_a(str(tmp_path / 'a.pdf'))
+    with pytest.raises(ArchiveLimitExceeded, match='size'):
+        save_b(str(tmp_path / 'b.pdf'))
+
+def test_spool_stops_at_limit():
+    """Test that spooling a stream longer than the limit is refused"""
+    assert spool(io.BytesIO(b'x' * 100), max_bytes=100).read() == b'x' * 100
+    with pytest.raises(ArchiveLimitExceeded):
+        spool(io.BytesIO(b'x' * 101), max_bytes=100)
+
+def test_member_size_limit(tmp_path, monkeypatch):
+    """Test that a single member over the per-file limit is refused before and during decompression"""
+    archive = ZipMembers(make_zip({'big.pdf': os.urandom(2000)}), max_member_bytes=1000)
+    (_, save), = archive
+    with pytest.raises(ArchiveLimitExceeded, match='file size'):
+        save(str(tmp_path / 'big.pdf'))
+
+    archive = ZipMembers(make_zip({'big.pdf': os.urandom(2000)}), max_member_bytes=1000)
+    monkeypatch.setattr(archive, '_check_declared', lambda info: None)
+    (_, save), = archive
+    with pytest.raises(ArchiveLimitExceeded, match='file size'):
+        save(str(tmp_path / 'big.pdf'))
@@ -0,0 +1,129 @@
+import os
+import sys
+import pytest
+import fitz  # PyMuPDF
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fingerprint import TemplateIndex, first_page_words, benchmark, learn_and_save
+from pdf_extractor import PDFFieldExtractor
+
+def make_invoice(path, document_number, total_due, offset=0):
+    """Write a single-page invoice with a fixed supplier layout"""
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = [
+        (50, 60, 'Acme Widgets Ltd'),
+        (50, 100, 'Invoice Number:'),
+        (200, 100, document_number),
+        (50, 130, 'Customer Account:'),
+        (200, 130, 'C-1001'),
+        (50, 400, 'Amount Payable:'),
+        (200, 400, total_due),
+        (50, 700, 'Thank you for your business'),
+    ]
+    for x, y, text in lines:
+        page.insert_text((x, y + offset), text)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+@pytest.fixture
+def index(tmp_path):
+    pdf_path = make_invoice(tmp_path / 'learn.pdf', '12345678', '1,250.00')
+    index = TemplateIndex()
+    index.learn(first_page_words(pdf_path), {'document_number': '12345678', 'total_due': '1250.00'}, name='acme')
+    return index
+
+def test_learned_template_extracts_new_document(tmp_path, index):
+    """Test that a learned template reads fields from another document of the same layout"""
+    pdf_path = make_invoice(tmp_path / 'new.pdf', '87654321', '9,999.99')
+    with PDFFieldExtractor(pdf_path, template_index=index) as extractor:
+        fields = extractor.extract_fields()
+        assert extractor.template_name == 'acme'
+    assert fields['document_number'] == '87654321'
+    assert fields['total_due'] == '9999.99'
+
+def test_template_follows_anchor_shift(tmp_path, index):
+    """Test that field boxes move with their anchor label"""
+    pdf_path = make_invoice(tmp_path / 'shifted.pdf', '11112222', '42.00', offset=6)
+    with PDFFieldExtractor(pdf_path, template_index=index) as extractor:
+        fields = extractor.extract_fields()
+    assert fields['document_number'] == '11112222'
+    assert fields['total_due'] == '42.00'
+
+def test_unknown_layout_uses_generic_path(index):
+    """Test that documents without a matching template fall back to the generic search"""
+    sample_pdf = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+    with PDFFieldExtractor(sample_pdf) as extractor:
+        expected = extractor.extract_fields()
+    with PDFFieldExtractor(sample_pdf, template_index=index) as extractor:
+        assert extractor.extract_fields() == expected
+        assert extractor.template_name is None
+
+def test_index_round_trip(tmp_path, index):
+    """Test that the index survives saving and loading"""
+    index_path = str(tmp_path / 'index.json')
+    index.save(index_path)
+    loaded = TemplateIndex.load(index_path)
+    assert list(loaded.templates) == ['acme']
+    assert loaded.templates['acme'].fields == index.templates['acme'].fields
+
+def test_benchmark_reports_both_paths(tmp_path, index):
+    """Test that the benchmark compares template routing with the generic path"""
+    pdf_path = make_invoice(tmp_path / 'bench.pdf', '55556666', '10.00')
+    stats = benchmark(index, [(pdf_path, {'document_number': '55556666', 'total_due': '10.00'})])
+    assert stats['template_hits'] == 1
+    assert stats['template_correct'] == 2
+
+def test_partial_template_falls_back_to_generic_search(tmp_path):
+    """Test that fields a template does not know are still found by the generic search"""
+    sample_pdf = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+    with PDFFieldExtractor(sample_pdf) as extractor:
+        expected = extractor.extract_fields()
+    if 'company_name' not in expected:
+        pytest.skip("No company name found in sample PDF")
+
+    index = TemplateIndex()
+    index.learn(first_page_words(sample_pdf), {'company_name': expected['company_name']}, name='partial')
+    with PDFFieldExtractor(sample_pdf, template_index=index) as extractor:
+        fields = extractor.extract_fields()
+        assert extractor.template_name == 'partial'
+    assert set(fields) == set(expected)
+
+def test_learn_rejects_template_without_fields(tmp_path):
+    """Test that a template whose values cannot be located is not learned"""
+    pdf_path = make_invoice(tmp_path / 'learn.pdf', '12345678', '1,250.00')
+    index = TemplateIndex()
+    with pytest.raises(ValueError):
+        index.learn(first_page_words(pdf_path), {'document_number': '99999999'})
+    assert len(index) == 0
+
+def test_learn_and_save_keeps_other_templates(tmp_path, index):
+    """Test that learning reloads the index file instead of overwriting it"""
+    index_path = str(tmp_path / 'index.json')
+    index.save(index_path)
+
+    pdf_path = make_invoice(tmp_path / 'other.pdf', '24681357', '7.50')
+    learn_and_save(index_path, first_page_words(pdf_path), {'document_number': '24681357'}, name='other')
+    assert sorted(TemplateIndex.load(index_path).templates) == ['acme', 'other']
+
+def test_non_matching_box_falls_back_to_generic_search(tmp_path, index):
+    """Test that a template box holding a value of the wrong shape is left to the generic search"""
+    doc = fitz.open()
+    page = doc.new_page()
+    for x, y, text in [(50, 60, 'Acme Widgets Ltd'), (50, 100, 'Invoice Number:'), (200, 100, 'PENDING'),
+                       (50, 130, 'Customer Account:'), (200, 130, 'C-1001'), (50, 400, 'Amount Payable:'),
+                       (200, 400, '9,999.99'), (50, 700, 'Thank you for your business'),
+                       (50, 750, 'Order No: 13572468')]:
+        page.insert_text((x, y), text)
+    pdf_path = str(tmp_path / 'pending.pdf')
+    doc.save(pdf_path)
+    doc.close()
+
+    with PDFFieldExtractor(pdf_path, template_index=index) as extractor:
+        fields = extractor.extract_fields()
+        assert extractor.template_name == 'acme'
+    assert fields['document_number'] == '13572468'
+    assert fields['total_due'] == '9999.99'
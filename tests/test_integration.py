@@ -1,6 +1,7 @@
 import os
 import io
 import sys
+import zipfile
 import pytest
 from flask import url_for
 from werkzeug.datastructures import FileStorage
@@ -11,6 +12,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import app, db
 from models import User
+from pdf_extractor import PDFFieldExtractor
 
 @pytest.fixture
 def test_client():
@@ -198,4 +200,73 @@ def test_concurrent_users(test_client):
                 data=data,
                 content_type='multipart/form-data'
             )
-        assert response.status_code == 200 
\ No newline at end of file
+        assert response.status_code == 200 
+
+def test_learn_template(test_client, tmp_path, monkeypatch):
+    """Test teaching the template index a layout from confirmed values"""
+    login(test_client)
+    monkeypatch.setitem(app.config, 'TEMPLATE_INDEX_PATH', str(tmp_path / 'template_index.json'))
+    monkeypatch.setitem(app.config, 'TEMPLATE_ADMINS', ['testuser'])
+    
+    test_pdf = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+    with PDFFieldExtractor(test_pdf) as extractor:
+        fields = extractor.extract_fields()
+    if not fields:
+        pytest.skip("No fields found in sample PDF")
+    
+    with open(test_pdf, 'rb') as pdf:
+        data = dict(fields, file=(io.BytesIO(pdf.read()), 'test.pdf'), name='sample')
+        response = test_client.post('/templates/learn', data=data, content_type='multipart/form-data')
+    
+    assert response.status_code == 200
+    assert response.json['template'] == 'sample'
+    assert os.path.exists(app.config['TEMPLATE_INDEX_PATH'])
+
+def test_learn_template_rejects_unknown_values(test_client, tmp_path, monkeypatch):
+    """Test that a template is not saved when none of the values are on the page"""
+    login(test_client)
+    monkeypatch.setitem(app.config, 'TEMPLATE_INDEX_PATH', str(tmp_path / 'template_index.json'))
+    monkeypatch.setitem(app.config, 'TEMPLATE_ADMINS', ['testuser'])
+    
+    test_pdf = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+    with open(test_pdf, 'rb') as pdf:
+        data = {'file': (io.BytesIO(pdf.read()), 'test.pdf'), 'document_number': '0000000000000'}
+        response = test_client.post('/templates/learn', data=data, content_type='multipart/form-data')
+    
+    assert response.status_code == 400
+    assert not os.path.exists(app.config['TEMPLATE_INDEX_PATH'])
+
+def test_learn_template_requires_admin(test_client, tmp_path, monkeypatch):
+    """Test that ordinary users cannot change the shared template index"""
+    login(test_client)
+    monkeypatch.setitem(app.config, 'TEMPLATE_INDEX_PATH', str(tmp_path / 'template_index.json'))
+    monkeypatch.setitem(app.config, 'TEMPLATE_ADMINS', [])
+    
+    test_pdf = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+    with open(test_pdf, 'rb') as pdf:
+        data = {'file': (io.BytesIO(pdf.read()), 'test.pdf'), 'document_number': '12345678'}
+        response = test_client.post('/templates/learn', data=data, content_type='multipart/form-data')
+    
+    assert response.status_code == 403
+    assert not os.path.exists(app.config['TEMPLATE_INDEX_PATH'])
+
+def test_upload_zip_archive(test_client):
+    """Test uploading a ZIP archive of PDF files"""
+    login(test_client)
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in ('sample1.pdf', 'sample2.pdf'):
+            zf.write(os.path.join(os.path.dirname(__file__), 'test_data', name), f'batch/{name}')
+        zf.writestr('batch/notes.txt', 'not a pdf')
+    archive.seek(0)
+    
+    response = test_client.post(
+        '/upload',
+        data={'files[]': (archive, 'batch.zip')},
+        content_type='multipart/form-data'
+    )
+    
+    assert response.status_code == 200
+    df = pd.read_excel(io.BytesIO(response.data))
+    assert sorted(df['Source_File'].values) == ['sample1.pdf', 'sample2.pdf']
@@ -0,0 +1,40 @@
+import os
+import sys
+import argparse
+import subprocess
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from loadtest import parse_config, percentile, encode_multipart, read_usage
+
+def test_parse_config():
+    """Test parsing of worker model specs"""
+    assert parse_config('sync:3') == {'spec': 'sync:3', 'worker_class': 'sync', 'workers': 3, 'threads': 1}
+    assert parse_config('gthread:2x8')['threads'] == 8
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_config('gthread')
+
+def test_percentile():
+    """Test latency percentiles"""
+    values = list(range(100, -1, -1))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 90) == 0.0
+
+def test_encode_multipart():
+    """Test that upload batches are encoded as files[] parts"""
+    body, content_type = encode_multipart([('files[]', 'a.pdf', b'%PDF-a'), ('files[]', 'b.pdf', b'%PDF-b')])
+    boundary = content_type.split('boundary=')[1]
+    assert body.count(f'--{boundary}'.encode()) == 3
+    assert b'filename="b.pdf"' in body and b'%PDF-a' in body
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason='needs /proc')
+def test_read_usage_counts_reaped_children():
+    """Test that CPU time of finished child processes is included"""
+    subprocess.run([sys.executable, '-c', 'sum(range(10 ** 7))'], check=True)
+    times = os.times()
+    cpu_seconds, rss_bytes = read_usage(os.getpid())
+    assert cpu_seconds >= times.user + times.children_user - 0.05
+    assert rss_bytes > 0
@@ -0,0 +1,80 @@
+import os
+import re
+import sys
+import time
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import safe_regex
+from safe_regex import PatternStats, SafePattern, analyse
+from pdf_extractor import PDFFieldExtractor
+
+def test_analyse_flags_nested_quantifiers():
+    """Test that the classic (a+)+ shape is reported"""
+    assert any('nested' in warning for warning in analyse(r'(a+)+$'))
+
+def test_analyse_flags_overlapping_alternation():
+    """Test that a repeated alternation whose branches start alike is reported"""
+    assert any('alternation' in warning for warning in analyse(r'(a|ab)*c'))
+
+def test_analyse_accepts_simple_patterns():
+    """Test that the plain patterns used for invoice fields are not reported"""
+    assert analyse(r'\d{10}') == []
+    assert analyse(r'Document\s*Number\s*:\s*(\d+)', re.IGNORECASE) == []
+
+def test_analyse_flags_unbounded_multiline_class():
+    """Test that an unbounded class spanning lines before a suffix is recognised as risky"""
+    assert analyse(r'([A-Z][A-Za-z0-9\s\.,&]+(Ltd|Inc)\b)', re.IGNORECASE)
+
+def test_shipped_patterns_are_bounded():
+    """Test that none of the field or label patterns are reported"""
+    for field_info in PDFFieldExtractor.FIELD_PATTERNS.values():
+        assert analyse(field_info['pattern'], re.IGNORECASE) == []
+        for label in field_info['labels']:
+            assert analyse(PDFFieldExtractor.label_pattern(label)) == []
+
+def test_finditer_matches_re():
+    """Test that windowed iteration finds the same matches as re.finditer"""
+    text = 'PO 1234567890, ref 0987654321 and 1111111111'
+    pattern = SafePattern(r'\d{10}', name='test:finditer')
+    assert [m.group() for m in pattern.finditer(text)] == re.findall(r'\d{10}', text)
+
+def test_window_bounds_search():
+    """Test that matches beyond the window are not seen and the cut is counted"""
+    text = 'x' * 100 + 'needle'
+    assert SafePattern('needle', name='test:window', window=50).search(text) is None
+    assert SafePattern('needle', window=200).search(text) is not None
+    assert safe_regex.stats.drain()['test:window']['truncated'] == 1
+
+def test_search_sees_whole_text_by_default():
+    """Test that values far into a long document are still found"""
+    text = 'x' * 100000 + '\ntotal due: 42.00\n'
+    pattern = SafePattern(PDFFieldExtractor.label_pattern('total due'))
+    assert pattern.search(text).group(1) == '42.00'
+
+@pytest.mark.skipif(safe_regex.regex is None, reason='regex module not installed')
+def test_timeout_abandons_pathological_match(monkeypatch):
+    """Test that a catastrophic backtracking search gives up within the budget"""
+    monkeypatch.setattr(safe_regex, 'MATCH_TIMEOUT', 0.05)
+    pattern = SafePattern(r'(a+)+$', name='test:timeout')
+    start = time.perf_counter()
+    assert pattern.search('a' * 40 + 'b') is None
+    assert time.perf_counter() - start < 2
+    assert pattern in safe_regex._registry
+
+def test_stats_record_and_slowest():
+    """Test that the slowest pattern is reported first and timeouts are counted"""
+    stats = PatternStats()
+    stats.record('fast', 0.001)
+    stats.record('slow', 0.5, timed_out=True)
+    stats.merge({'fast': {'calls': 2, 'total': 0.002, 'max': 0.001, 'timeouts': 0}})
+
+    slowest = stats.slowest()
+    assert [row['name'] for row in slowest] == ['slow', 'fast']
+    assert slowest[0]['timeouts'] == 1
+    assert slowest[1]['calls'] == 3
+
+    assert set(stats.drain()) == {'slow', 'fast'}
+    assert stats.slowest() == []
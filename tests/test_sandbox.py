@@ -0,0 +1,75 @@
+import os
+import sys
+import pytest
+import fitz  # PyMuPDF
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_extractor import PDFFieldExtractor
+from sandbox import ExtractionSandbox, ExtractionBudgetExceeded, ExtractionFailed
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+
+@pytest.fixture
+def sandbox():
+    box = ExtractionSandbox(timeout=30, memory_limit=1024 * 1024 * 1024, max_pages=50, max_tasks_per_worker=2)
+    yield box
+    box.close()
+
+def test_sandbox_matches_inline_extraction(sandbox):
+    """Test that sandboxed extraction returns the same fields as inline extraction"""
+    with PDFFieldExtractor(SAMPLE_PDF) as extractor:
+        expected = extractor.extract_fields()
+    assert sandbox.extract(SAMPLE_PDF) == expected
+
+def test_sandbox_reports_errors_per_file(sandbox):
+    """Test that a broken document is reported without taking down the worker"""
+    with pytest.raises(ExtractionFailed) as excinfo:
+        sandbox.extract(os.path.join(os.path.dirname(__file__), 'test_data', 'missing.pdf'))
+    assert not isinstance(excinfo.value, ExtractionBudgetExceeded)
+    assert sandbox.extract(SAMPLE_PDF) is not None
+
+def test_sandbox_page_limit(tmp_path):
+    """Test that documents over the page cap are rejected"""
+    long_pdf = str(tmp_path / 'long.pdf')
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    doc.save(long_pdf)
+    doc.close()
+
+    with ExtractionSandbox(max_pages=2) as box:
+        with pytest.raises(ExtractionBudgetExceeded, match='page limit'):
+            box.extract(long_pdf)
+
+def test_sandbox_time_limit():
+    """Test that documents over the time budget are killed"""
+    with ExtractionSandbox(timeout=0.0001) as box:
+        with pytest.raises(ExtractionBudgetExceeded, match='time limit'):
+            box.extract(SAMPLE_PDF)
+        assert not box._idle
+
+def test_sandbox_memory_limit(tmp_path):
+    """Test that a worker going over its address-space cap is killed"""
+    big_pdf = str(tmp_path / 'big.pdf')
+    doc = fitz.open()
+    for _ in range(100):
+        page = doc.new_page()
+        page.insert_textbox(page.rect, ('Invoice line item ' * 8 + '\n') * 150, fontsize=3)
+    doc.save(big_pdf)
+    doc.close()
+
+    with ExtractionSandbox(memory_limit=1, max_pages=None) as box:
+        with pytest.raises(ExtractionBudgetExceeded, match='memory'):
+            box.extract(big_pdf)
+        assert not box._idle
+
+def test_sandbox_recycles_workers(sandbox):
+    """Test that workers are replaced after max_tasks_per_worker documents"""
+    sandbox.extract(SAMPLE_PDF)
+    first_pid = sandbox._idle[0].process.pid
+    sandbox.extract(SAMPLE_PDF)
+    assert not sandbox._idle
+    sandbox.extract(SAMPLE_PDF)
+    assert sandbox._idle[0].process.pid != first_pid
@@ -0,0 +1,65 @@
+import os
+import sys
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pdf_extractor import PDFFieldExtractor
+from textstore import TextStore, document_hash, ingest, rematch
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), 'test_data', 'sample.pdf')
+
+@pytest.fixture
+def store(tmp_path):
+    store = TextStore(str(tmp_path / 'text_store.bin'))
+    yield store
+    store.close()
+
+def test_put_and_get(store):
+    """Test that stored page text comes back unchanged"""
+    store.put('abc', ['page one', 'page two £1,000.00'], [[1.0, 2.0, 3.0, 4.0, 'word', 0, 0, 0]], name='a.pdf')
+    record = store.get('abc')
+    assert record['pages'] == ['page one', 'page two £1,000.00']
+    assert record['words'][0][4] == 'word'
+    assert record['name'] == 'a.pdf'
+    assert store.get('missing') is None
+
+def test_store_is_shared_between_instances(store):
+    """Test that records appended by one handle are visible to another"""
+    other = TextStore(store.path)
+    assert len(other) == 0
+    store.put('abc', ['text'])
+    assert 'abc' in other
+    assert other.get('abc')['pages'] == ['text']
+    other.close()
+
+def test_rejects_foreign_file(tmp_path):
+    """Test that a file that is not a text store is refused"""
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a store')
+    with pytest.raises(ValueError):
+        TextStore(str(path))
+
+def test_extraction_reuses_stored_text(store):
+    """Test that a stored document is matched without parsing its pages again"""
+    with PDFFieldExtractor(SAMPLE_PDF, text_store=store) as extractor:
+        expected = extractor.extract_fields()
+    assert document_hash(SAMPLE_PDF) in store
+
+    with PDFFieldExtractor(SAMPLE_PDF, text_store=store) as extractor:
+        extractor.doc = None  # Any attempt to parse the PDF would now fail
+        assert extractor.extract_fields() == expected
+
+def test_rematch_matches_stored_documents(store):
+    """Test that re-matching stored text gives the same fields as parsing the PDF"""
+    assert ingest(store, [SAMPLE_PDF, SAMPLE_PDF]) == 1
+    with PDFFieldExtractor(SAMPLE_PDF) as extractor:
+        expected = extractor.extract_fields()
+
+    rows = list(rematch(store, match_patterns=lambda pages: {'pages': [str(len(pages))]}))
+    assert len(rows) == 1
+    assert rows[0]['Source_File'] == 'sample.pdf'
+    assert rows[0]['pages'] == '1'
+    for field_name, value in expected.items():
+        assert rows[0][field_name] == value
@@ -0,0 +1,269 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+try:
+    import fcntl  # Unix only
+except ImportError:
+    fcntl = None
+
+MAGIC = b'EPATXT01'
+
+
+def document_hash(pdf_path: str) -> str:
+    """Return the SHA-256 hex digest of a PDF file's bytes."""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextStore:
+    """Persistent store of extracted page text keyed by document hash.
+
+    Records are zlib-compressed JSON appended to a single container file
+    and read back individually at their offsets, so a large store costs no
+    address space in memory-limited sandbox workers. A sidecar ``<path>.idx`` file holds one
+    ``<hash> <offset> <length>`` line per record. Both files are append-only,
+    so several processes can share a store; appends are serialised with an
+    exclusive file lock where the platform supports it.
+    """
+
+    def __init__(self, path: str, store_words: bool = True):
+        """Open or create a text store.
+
+        Args:
+            path (str): Path to the container file
+            store_words (bool): Also keep the first page's word boxes
+        """
+        self.path = path
+        self.index_path = f'{path}.idx'
+        self.store_words = store_words
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._index_read = 0
+        self._reader = None
+        self._lock = threading.Lock()
+
+        with open(path, 'ab') as f:
+            def write_header():
+                if f.seek(0, os.SEEK_END) == 0:
+                    f.write(MAGIC)
+            self._locked(f, write_header)
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a text store')
+
+    @staticmethod
+    def _locked(f, action):
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            return action()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh_index(self):
+        """Read index lines appended since the last refresh, by any process."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_read)
+            data = f.read()
+        # Ignore a trailing line that another process is still writing
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.decode('ascii').splitlines():
+            doc_hash, offset, length = line.split()
+            self._offsets[doc_hash] = (int(offset), int(length))
+        self._index_read += len(complete)
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """Read one record from the container."""
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        if hasattr(os, 'pread'):
+            return os.pread(self._reader.fileno(), length, offset)
+        self._reader.seek(offset)
+        return self._reader.read(length)
+
+    def __contains__(self, doc_hash: str) -> bool:
+        with self._lock:
+            if doc_hash not in self._offsets:
+                self._refresh_index()
+            return doc_hash in self._offsets
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh_index()
+            return len(self._offsets)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._refresh_index()
+            return list(self._offsets)
+
+    def get(self, doc_hash: str) -> Optional[Dict[str, Any]]:
+        """Load a stored document.
+
+        Args:
+            doc_hash (str): Hash of the PDF, see ``document_hash``
+
+        Returns:
+            Dict[str, Any]: ``pages`` text, first-page ``words`` and ``name``, or None if unknown
+        """
+        with self._lock:
+            if doc_hash not in self._offsets:
+                self._refresh_index()
+            entry = self._offsets.get(doc_hash)
+            if entry is None:
+                return None
+            offset, length = entry
+            data = self._read(offset, length)
+        return json.loads(zlib.decompress(data))
+
+    def put(self, doc_hash: str, pages: List[str], words: Optional[List] = None, name: Optional[str] = None):
+        """Append a document's text to the store.
+
+        Args:
+            doc_hash (str): Hash of the PDF, see ``document_hash``
+            pages (List[str]): Text of each page
+            words (List): Word boxes of the first page
+            name (str): Original file name, kept for reports
+        """
+        record = {'name': name, 'pages': pages, 'words': words if self.store_words else None}
+        data = zlib.compress(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+
+        with self._lock, open(self.path, 'ab') as f:
+            def append():
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                with open(self.index_path, 'a') as index:
+                    index.write(f'{doc_hash} {offset} {len(data)}\n')
+                self._offsets[doc_hash] = (offset, len(data))
+            self._locked(f, append)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over ``(doc_hash, record)`` for every stored document."""
+        for doc_hash in self.keys():
+            yield doc_hash, self.get(doc_hash)
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_stores: Dict[str, TextStore] = {}
+
+
+def open_store(path: Optional[str]) -> Optional[TextStore]:
+    """Return the shared store for ``path`` in this process, or None if disabled."""
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = TextStore(path)
+    return _stores[path]
+
+
+def ingest(store: TextStore, pdf_paths: List[str]) -> int:
+    """Parse PDFs that are not stored yet and add their text to the store.
+
+    Returns:
+        int: Number of newly stored documents
+    """
+    from pdf_extractor import PDFFieldExtractor
+
+    added = 0
+    for pdf_path in pdf_paths:
+        doc_hash = document_hash(pdf_path)
+        if doc_hash in store:
+            continue
+        with PDFFieldExtractor(pdf_path) as extractor:
+            store.put(doc_hash, extractor.page_texts(), extractor.first_page_words(),
+                      name=os.path.basename(pdf_path))
+        added += 1
+    return added
+
+
+def rematch(store: TextStore, template_index=None, match_patterns=None) -> Iterator[Dict[str, Any]]:
+    """Re-run field matching over every stored document without parsing any PDF.
+
+    Args:
+        store (TextStore): Store to read page text from
+        template_index (TemplateIndex): Known vendor layouts to route documents to
+        match_patterns (Callable): Optional ``pages -> {name: [matches]}`` matcher,
+            e.g. the app's ``DEFAULT_PATTERNS`` search
+
+    Yields:
+        Dict[str, Any]: Extracted fields plus ``Document_Hash`` and ``Source_File``
+    """
+    from pdf_extractor import PDFFieldExtractor
+
+    for doc_hash, record in store.items():
+        extractor = PDFFieldExtractor.from_text(record['pages'], record.get('words'), template_index=template_index)
+        fields = dict(extractor.extract_fields())
+        if match_patterns is not None:
+            for var_name, matches in match_patterns(record['pages']).items():
+                fields[var_name] = '; '.join(matches)
+        yield dict(fields, Document_Hash=doc_hash, Source_File=record.get('name'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the compressed page-text store')
+    parser.add_argument('--store', default='text_store.bin', help='Path to the text store')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_cmd = commands.add_parser('ingest', help='Parse PDFs once and store their text')
+    ingest_cmd.add_argument('pdfs', nargs='+')
+
+    rematch_cmd = commands.add_parser('rematch', help='Re-match every stored document with the current patterns')
+    rematch_cmd.add_argument('--index', help='Template index to route known layouts with')
+    rematch_cmd.add_argument('--output', help='CSV file to write, defaults to stdout')
+    rematch_cmd.add_argument('--default-patterns', action='store_true',
+                             help="Also match the app's DEFAULT_PATTERNS")
+
+    args = parser.parse_args()
+
+    with TextStore(args.store) as store:
+        start = time.perf_counter()
+        if args.command == 'ingest':
+            added = ingest(store, args.pdfs)
+            print(f'Stored {added} new documents ({len(store)} total) in {time.perf_counter() - start:.2f}s')
+            return
+
+        from fingerprint import load_index
+        match_patterns = None
+        if args.default_patterns:
+            from app import DEFAULT_PATTERNS, match_variables
+            match_patterns = lambda pages: match_variables(pages, DEFAULT_PATTERNS)
+        rows = list(rematch(store, load_index(args.index), match_patterns))
+        columns = ['Source_File', 'Document_Hash'] + sorted({key for row in rows for key in row} - {'Source_File', 'Document_Hash'})
+        output = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            writer = csv.DictWriter(output, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        finally:
+            if args.output:
+                output.close()
+        print(f'Re-matched {len(rows)} documents in {time.perf_counter() - start:.2f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()